@@ -0,0 +1,349 @@
+''' Synthetic capture generator and benchmark suite.
+
+    python bench.py                          run the default sizes and compare with the baseline
+    python bench.py --sizes 1K,1M,100M       pick the capture sizes
+    python bench.py --save-baseline          store this run as the new baseline
+    python bench.py --generate out.txt 1M    only write a synthetic capture
+
+    Captures are built from the devices in settings.json and their devices/*.json register maps.
+    Every benchmark runs in its own process so peak RSS is per benchmark. A run fails (exit 1)
+    when lines/sec, decode frames/sec or startup time regress past the tolerance, or peak RSS grows past it.
+    Timings are the median of several runs and the baseline stores their spread, so a metric only fails
+    when it moves further than the measured noise, up to MAX_NOISE. Timings that stay noisier than
+    MAX_SPREAD after MAX_REPEATS runs fail too. Failing benchmarks are re-run once to confirm.
+    A check run without a baseline fails, save one on the machine that runs the check first.
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import statistics
+
+import parmesean
+from parmesean import (Parmesean, load_device_def, tokenize, SETTINGS_FILE, DEVICES_DIR, CURRENT_DIR)
+
+BENCH_DIR = os.path.join(CURRENT_DIR, "bench")
+BASELINE_FILE = os.path.join(CURRENT_DIR, "bench_baseline.json")
+DEFAULT_SIZES = "1K,10K,100K"
+TOLERANCE = 0.20 # Allowed regression before a run fails
+MIN_SECONDS = 0.005 # Shorter baseline timings are compared as if they took this long
+MIN_WORK = 200000 # Small captures are repeated until at least this many lines/frames are timed
+REPEATS = 7 # Median of at least REPEATS timings is reported
+MAX_REPEATS = 21 # More runs are added while the spread is above MAX_SPREAD, up to this many
+MAX_SPREAD = 0.15 # Timings still noisier than this can't be compared and fail the check
+NOISE_FACTOR = 2 # A timing may also move this many times the combined spread before it fails
+MAX_NOISE = 0.10 # but never more than this on top of the tolerance
+STARTUP_RUNS = 3 # Startups per startup timing
+CONFIRM_RUNS = 1 # Re-runs of a failing benchmark. It only fails if every re-run fails too
+
+# Relative weight of each kind of transaction in a generated capture
+MIX = {
+    "L11" : 30,
+    "L16" : 10,
+    "LINEAR" : 15,
+    "REG" : 15,
+    "PAGE" : 5,
+    "RAW" : 10, # Devices without a parser
+    "NACK" : 5,
+    "UNKNOWN" : 5, # Addresses not in settings.json
+    "REPEATED_START" : 5, # Register write + repeated start read
+}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    scale = {"K": 1000, "M": 1000 ** 2, "G": 1000 ** 3}.get(text[-1:], 1)
+    return int(float(text.rstrip("KMG")) * scale)
+
+
+def load_targets(settings_file: str = SETTINGS_FILE, devices_dir: str = DEVICES_DIR):
+    ''' (addresses, registers by format, page registers, raw addresses) from the settings and device files '''
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        settings = json.load(f)
+
+    by_format = {} # format -> [(addr, page, reg)]
+    page_regs = [] # (addr, [pages]) for devices with a PAGE register
+    raw = [] # Addresses without a parser
+    addrs = set()
+    for d in settings["devices"]:
+        addr = int(d["address"], 16)
+        addrs.add(addr)
+        if d["parser"] == "":
+            raw.append(addr)
+            continue
+        definition = load_device_def(os.path.join(devices_dir, d["parser"]))
+        for page, table in definition.pages.items():
+            for dec in table:
+                if dec is None or dec.format is None:
+                    continue
+                by_format.setdefault(dec.format, []).append((addr, page, int(dec.reg, 16)))
+        if definition.page_regs:
+            page_regs.append((addr, min(definition.page_regs), list(definition.pages)))
+    return addrs, by_format, page_regs, raw
+
+
+def frame(addr: int, rw: str, data, ack_last: bool = True) -> str:
+    ''' One analyzer frame in the bracket text format '''
+    parts = [f"[0x{addr:02X}{rw} +"]
+    for i, b in enumerate(data):
+        ack = "-" if (i == len(data) - 1 and not ack_last) else "+"
+        parts.append(f" 0x{b:02X} {ack}")
+    return "".join(parts) + " "
+
+
+def generate_lines(count: int, seed: int = 1, settings_file: str = SETTINGS_FILE, devices_dir: str = DEVICES_DIR):
+    ''' Yield count synthetic analyzer lines '''
+    rnd = random.Random(seed)
+    addrs, by_format, page_regs, raw = load_targets(settings_file, devices_dir)
+    unknown = [a for a in range(0x08, 0x78) if a not in addrs]
+    kinds = [k for k in MIX if k not in ("L11", "L16", "LINEAR", "REG") or by_format.get(k)]
+    if not page_regs:
+        kinds.remove("PAGE")
+    if not raw:
+        kinds.remove("RAW")
+    weights = [MIX[k] for k in kinds]
+
+    for kind in rnd.choices(kinds, weights, k=count):
+        if kind in ("L11", "L16", "LINEAR", "REG"):
+            addr, page, reg = rnd.choice(by_format[kind])
+            line = frame(addr, "W", (reg, rnd.randrange(256), rnd.randrange(256)))
+        elif kind == "REPEATED_START":
+            addr, page, reg = rnd.choice(by_format.get("L11") or by_format[next(iter(by_format))])
+            line = frame(addr, "W", (reg,)).rstrip() + frame(addr, "R", (rnd.randrange(256), rnd.randrange(256)), ack_last=False)
+        elif kind == "PAGE":
+            addr, reg, pages = rnd.choice(page_regs)
+            line = frame(addr, "W", (reg, int(rnd.choice(pages))))
+        elif kind == "RAW":
+            line = frame(rnd.choice(raw), rnd.choice("WR"), [rnd.randrange(256) for _ in range(rnd.randint(1, 6))])
+        elif kind == "NACK":
+            line = f"[0x{rnd.choice(sorted(addrs)):02X}{rnd.choice('WR')} - "
+        else:
+            line = frame(rnd.choice(unknown), "W", [rnd.randrange(256) for _ in range(rnd.randint(1, 3))])
+        yield line + "]\n"
+
+
+def generate_capture(path: str, count: int, seed: int = 1, settings_file: str = SETTINGS_FILE, devices_dir: str = DEVICES_DIR) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', buffering=1024 * 1024) as f:
+        f.writelines(generate_lines(count, seed, settings_file, devices_dir))
+    return path
+
+
+def capture_for(count: int, seed: int = 1) -> str:
+    ''' Cached synthetic capture for a size '''
+    path = os.path.join(BENCH_DIR, f"synthetic_{count}_{seed}.txt")
+    if not os.path.exists(path):
+        generate_capture(path, count, seed)
+    return path
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def spread_of(times) -> float:
+    ''' Interquartile range relative to the median '''
+    median = statistics.median(times)
+    if len(times) < 2 or not median:
+        return 0.0
+    q1, _, q3 = statistics.quantiles(times, n=4)
+    return (q3 - q1) / median
+
+
+def median_of(fn, repeats: int = REPEATS, max_repeats: int = MAX_REPEATS):
+    ''' (median time, spread, result) over at least repeats calls of fn. Keeps adding calls while
+        the spread is above MAX_SPREAD, the caller decides what to do if it never settles '''
+    times = []
+    while len(times) < repeats or (spread_of(times) > MAX_SPREAD and len(times) < max_repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), spread_of(times), result
+
+
+STARTUP_CODE = "from parmesean import Parmesean; Parmesean().preload_devices()"
+
+def bench_startup() -> dict:
+    ''' startup_s is a whole new interpreter importing parmesean and loading every device. preload_s
+        is Parmesean() + preload_devices() in this process with the in memory definitions dropped '''
+    def start_process():
+        for _ in range(STARTUP_RUNS):
+            subprocess.run([sys.executable, "-c", STARTUP_CODE], check=True, cwd=CURRENT_DIR,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    rounds = 300
+    def preload():
+        for _ in range(rounds):
+            parmesean.DEVICE_DEFS.clear()
+            Parmesean().preload_devices()
+
+    startup, startup_spread, _ = median_of(start_process)
+    preload_s, preload_spread, _ = median_of(preload)
+    return {"startup_s": startup / STARTUP_RUNS, "startup_s_spread": startup_spread,
+            "preload_s": preload_s / rounds, "preload_s_spread": preload_spread, "peak_rss_kb": peak_rss_kb()}
+
+
+def bench_parse(path: str) -> dict:
+    ''' Full Parmesean path, file -> transactions '''
+    parm = Parmesean()
+
+    def run():
+        lines = frames = 0
+        while lines < MIN_WORK:
+            for line in parm.read_lines(path):
+                result = parm.parse(line)
+                lines += 1
+                if result is not None:
+                    frames += len(result)
+            if lines == 0:
+                break
+        return lines, frames
+
+    elapsed, spread, (lines, frames) = median_of(run)
+    return {"lines": lines, "frames": frames, "seconds": elapsed, "lines_per_s": lines / elapsed,
+            "lines_per_s_spread": spread, "peak_rss_kb": peak_rss_kb()}
+
+
+def bench_device_parse(path: str, limit: int = 1000000) -> dict:
+    ''' Only i2c_device.parse on pre-tokenized frames '''
+    parm = Parmesean()
+    parm.preload_devices()
+    frames = []
+    for line in parm.read_lines(path):
+        for addr, rw, fack, lack, payload in tokenize(line):
+            if addr in parm.devices:
+                frames.append((parm.devices[addr], addr, rw, bytes(payload), fack, lack))
+        if len(frames) >= limit:
+            break
+
+    rounds = max(1, MIN_WORK // max(1, len(frames)))
+
+    def run():
+        for _ in range(rounds):
+            for dev, addr, rw, payload, fack, lack in frames:
+                dev.parse(addr, rw, payload, fack, lack)
+
+    elapsed, spread, _ = median_of(run)
+    return {"frames": len(frames) * rounds, "seconds": elapsed, "frames_per_s": len(frames) * rounds / elapsed if elapsed else 0.0,
+            "frames_per_s_spread": spread, "peak_rss_kb": peak_rss_kb()}
+
+
+def run_child(name: str, arg: str = "") -> dict:
+    ''' Run one benchmark in a fresh interpreter so its peak RSS is its own '''
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, arg],
+                         check=True, capture_output=True, text=True, cwd=CURRENT_DIR)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def suite_jobs(sizes) -> dict:
+    ''' {result name: (benchmark, argument)} '''
+    jobs = {"startup": ("startup", "")}
+    for size in sizes:
+        path = capture_for(parse_size(size))
+        jobs[f"parse_{size}"] = ("parse", path)
+        jobs[f"device_parse_{size}"] = ("device_parse", path)
+    return jobs
+
+
+def run_suite(jobs: dict) -> dict:
+    return {name: run_child(*job) for name, job in jobs.items()}
+
+
+# (metric, True if higher is better)
+CHECKS = [("lines_per_s", True), ("frames_per_s", True), ("startup_s", False), ("preload_s", False), ("peak_rss_kb", False)]
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE):
+    ''' {benchmark: [regression messages]}. Benchmarks missing from the baseline fail too '''
+    failures = {}
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            failures.setdefault(name, []).append(f"{name}: not in the baseline")
+            continue
+        for metric, higher_better in CHECKS:
+            if metric not in res or metric not in base:
+                continue
+            spread = res.get(f"{metric}_spread", 0.0)
+            if spread > MAX_SPREAD:
+                failures.setdefault(name, []).append(f"{name} {metric}: too noisy to compare (spread {spread:.0%})")
+                continue
+            old = base[metric]
+            if metric.endswith("_s") and not metric.endswith("per_s"):
+                old = max(old, MIN_SECONDS)
+            if not old:
+                continue
+            allowed = tolerance
+            if metric != "peak_rss_kb":
+                allowed += min(MAX_NOISE, NOISE_FACTOR * (base.get(f"{metric}_spread", 0.0) + spread))
+            change = (res[metric] - old) / old
+            if (higher_better and change < -allowed) or (not higher_better and change > allowed):
+                failures.setdefault(name, []).append(
+                    f"{name} {metric}: {res[metric]:.4g} vs baseline {base[metric]:.4g} ({change:+.0%}, allowed {allowed:.0%})")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parmesean benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated capture sizes in lines (1K, 10M, ...)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--generate", nargs=2, metavar=("PATH", "LINES"), help="Only write a synthetic capture")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        name, arg = args.child
+        result = {"startup": lambda: bench_startup(),
+                  "parse": lambda: bench_parse(arg),
+                  "device_parse": lambda: bench_device_parse(arg)}[name]()
+        print(json.dumps(result))
+        sys.exit(0)
+
+    if args.generate:
+        path, lines = args.generate
+        generate_capture(path, parse_size(lines), args.seed)
+        print(f"Wrote {parse_size(lines)} lines to {path}")
+        sys.exit(0)
+
+    jobs = suite_jobs([s for s in args.sizes.split(",") if s])
+    results = run_suite(jobs)
+    for name, res in results.items():
+        print(f"{name:24} " + "  ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in res.items()))
+
+    if args.save_baseline:
+        noisy = [f"{name} {k[:-len('_spread')]}" for name, res in results.items()
+                 for k, v in res.items() if k.endswith("_spread") and v > MAX_SPREAD]
+        if noisy:
+            print(f"Not saving a baseline, too noisy: {', '.join(noisy)}")
+            sys.exit(1)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}. Run with --save-baseline to store one")
+        sys.exit(1)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.tolerance)
+    for _ in range(CONFIRM_RUNS):
+        if not failures:
+            break
+        print(f"Re-running {', '.join(failures)} to rule out noise")
+        failures = compare(run_suite({name: jobs[name] for name in failures}), baseline, args.tolerance)
+    if failures:
+        print("PERFORMANCE REGRESSION")
+        for msgs in failures.values():
+            for msg in msgs:
+                print(f"  {msg}")
+        sys.exit(1)
+    print("No regressions against the baseline")
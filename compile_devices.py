@@ -0,0 +1,313 @@
+''' Ahead of time compiler for the devices/*.xlsx register maps.
+
+    Every worksheet is read once, normalized (format case, signed, units, numbers, register
+    addresses), validated and written as a compact .pdef definition that load_device_def()
+    reads without any JSON parsing. Sheets whose content hash hasn't changed are skipped.
+    When the hand written devices/<name>.json exists next to the workbook the compiled registers
+    are built into decoders on both sides and any difference fails the sheet.
+
+    python compile_devices.py                        compile devices/*.xlsx into devices/compiled/
+    python compile_devices.py devices/TMP117.xlsx    one workbook
+    python compile_devices.py --force --json         rebuild everything and also write normalized JSON
+    python compile_devices.py --no-check             skip the comparison against the device JSON
+
+    Point a device's "parser" in settings.json at the .pdef file (e.g. "compiled/LTM4677.pdef") to use it.
+    The .xlsx files are read with zipfile/xml so no spreadsheet package is needed.
+'''
+import os
+import re
+import sys
+import json
+import glob
+import hashlib
+import zipfile
+import argparse
+import xml.etree.ElementTree as ET
+from typing import Dict, Any, List, Tuple, Optional
+
+from parmesean import (DEVICES_DIR, PDEF_EXT, BIT_FORMATS, reg_decoder, read_pdef, write_pdef, compile_fields, compile_page)
+
+OUT_DIR = os.path.join(DEVICES_DIR, "compiled")
+
+XLSX_NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+TEXT_TAG = f"{{{XLSX_NS['m']}}}t"
+
+FORMATS = ("PAGE", "REG", "BIT", "BIN", "HEX", "ASC", "L11", "L16", "LINEAR")
+ENDIANS = ("big", "little")
+TRUE_TEXT = ("1", "1.0", "TRUE", "YES", "Y")
+FALSE_TEXT = ("", "0", "0.0", "FALSE", "NO", "N")
+EMPTY_UNITS = ("", "NAN", "NONE")
+CHECK_ATTRS = ("name", "format", "units", "slope", "offset", "signed", "endian", "deadband", "fields") # Decoder state compared with the JSON
+
+
+def read_xlsx(path: str) -> Dict[str, List[List[Optional[str]]]]:
+    ''' {sheet name: rows}. Each row is a list of cell strings (None for empty cells) '''
+    with zipfile.ZipFile(path) as z:
+        strings = []
+        if "xl/sharedStrings.xml" in z.namelist():
+            for si in ET.fromstring(z.read("xl/sharedStrings.xml")).findall("m:si", XLSX_NS):
+                strings.append("".join(t.text or "" for t in si.iter(TEXT_TAG)))
+
+        rels = {rel.get("Id"): rel.get("Target") for rel in
+                ET.fromstring(z.read("xl/_rels/workbook.xml.rels")).findall("rel:Relationship", XLSX_NS)}
+        sheets = {}
+        for sheet in ET.fromstring(z.read("xl/workbook.xml")).find("m:sheets", XLSX_NS):
+            target = rels[sheet.get(f"{{{XLSX_NS['r']}}}id")].lstrip("/")
+            target = target if target.startswith("xl/") else "xl/" + target
+            sheets[sheet.get("name")] = read_sheet(z.read(target), strings)
+    return sheets
+
+
+def read_sheet(xml: bytes, strings: List[str]) -> List[List[Optional[str]]]:
+    rows = []
+    for row in ET.fromstring(xml).iter(f"{{{XLSX_NS['m']}}}row"):
+        cells = {}
+        for c in row.findall("m:c", XLSX_NS):
+            col = column_index(re.match(r"[A-Z]+", c.get("r")).group())
+            kind = c.get("t")
+            v = c.find("m:v", XLSX_NS)
+            if kind == "inlineStr":
+                value = "".join(t.text or "" for t in c.iter(TEXT_TAG))
+            elif v is None:
+                value = None
+            elif kind == "s":
+                value = strings[int(v.text)]
+            elif kind == "b":
+                value = "TRUE" if v.text == "1" else "FALSE"
+            else:
+                value = v.text
+            cells[col] = value
+        rows.append([cells.get(i) for i in range(max(cells) + 1)] if cells else [])
+    return rows
+
+
+def column_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - ord("A") + 1
+    return n - 1
+
+
+def sheet_hash(rows, reference: Optional[bytes] = None) -> str:
+    # The reference JSON is part of the hash so editing it re-runs the check
+    h = hashlib.sha256(json.dumps(rows).encode())
+    if reference is not None:
+        h.update(reference)
+    return h.hexdigest()
+
+
+def to_number(text: str, field: str, errors: List[str]):
+    # Keep whole numbers as int like the hand written JSON. LINEAR results keep the same int/float type
+    try:
+        value = float(text)
+    except ValueError:
+        errors.append(f"{field} is not a number: {text!r}")
+        return 0
+    if value != value:
+        return 0
+    return int(value) if value.is_integer() and re.fullmatch(r"[+-]?\d+", text.strip()) else value
+
+
+def normalize_row(row: Dict[str, str], errors: List[str], warnings: List[str]) -> Tuple[str, str, Dict[str, Any]]:
+    ''' (page, register, fields) for one sheet row '''
+    name = (row.get("name") or "").strip()
+    addr = (row.get("address") or "").strip()
+    try:
+        reg = int(addr, 16) if addr.lower().startswith("0x") else int(float(addr))
+    except ValueError:
+        errors.append(f"{name}: bad register address {addr!r}")
+        return None, None, None
+    if not 0 <= reg <= 0xFF:
+        errors.append(f"{name}: register address {addr} out of range")
+        return None, None, None
+
+    page = (row.get("page") or "0").strip()
+    page = str(int(float(page))) if re.fullmatch(r"[+-]?\d+(\.0*)?", page) else page
+    info = {"name": name}
+
+    length = (row.get("length") or "").strip()
+    if length:
+        info["length"] = int(to_number(length, f"{name} length", errors))
+
+    fmt = (row.get("format") or "").strip().upper()
+    fields = (row.get("fields") or "").strip()
+    if fields and fmt not in BIT_FORMATS:
+        errors.append(f"{name}: bit fields need a {'/'.join(BIT_FORMATS)} format, not {fmt or 'none'}")
+        fields = ""
+    if fmt in ("", "NAN", "NONE"):
+        return page, f"0x{reg:02X}", info
+    if fmt not in FORMATS:
+        errors.append(f"{name}: unknown format {fmt!r}")
+        return None, None, None
+    info["format"] = fmt
+
+    units = row.get("units")
+    info["units"] = "" if units is None or units.strip().upper() in EMPTY_UNITS else units.strip()
+
+    for field, default in (("slope", 1), ("offset", 0)):
+        text = (row.get(field) or "").strip()
+        info[field] = to_number(text, f"{name} {field}", errors) if text else default
+    if fmt == "LINEAR" and info["slope"] == 0:
+        warnings.append(f"{name}: LINEAR register with slope 0")
+
+    endian = (row.get("endian") or "big").strip().lower()
+    if endian not in ENDIANS:
+        errors.append(f"{name}: bad endian {endian!r}")
+        endian = "big"
+    info["endian"] = endian
+
+    signed = (row.get("signed") or "").strip().upper()
+    if signed not in TRUE_TEXT and signed not in FALSE_TEXT:
+        errors.append(f"{name}: bad signed value {signed!r}")
+    info["signed"] = signed in TRUE_TEXT
+
+    deadband = (row.get("deadband") or "").strip()
+    if deadband:
+        info["deadband"] = float(to_number(deadband, f"{name} deadband", errors))
+
+    # Bit fields as "NAME=7; OTHER=15:8"
+    if fields:
+        spec = {}
+        for part in re.split(r"[;,\n]", fields):
+            if part.strip():
+                field_name, _, bits = part.partition("=")
+                spec[field_name.strip()] = bits.strip()
+        try:
+            compile_fields(spec)
+            info["fields"] = spec
+        except ValueError:
+            errors.append(f"{name}: bad bit fields {fields!r}")
+    return page, f"0x{reg:02X}", info
+
+
+def normalize_sheet(rows) -> Tuple[Dict[str, Dict[str, Dict[str, Any]]], List[str], List[str]]:
+    ''' Normalized register map {page: {reg: fields}}, errors and warnings '''
+    errors = []
+    warnings = []
+    rows = [r for r in rows if any(c not in (None, "") for c in r)]
+    if not rows:
+        return {}, ["empty sheet"], warnings
+
+    header = [(h or "").strip().lower() for h in rows[0]]
+    for col in ("name", "address"):
+        if col not in header:
+            errors.append(f"missing {col} column")
+    if errors:
+        return {}, errors, warnings
+
+    regs = {}
+    for n, cells in enumerate(rows[1:], start=2):
+        row = {h: c for h, c in zip(header, cells) if h}
+        page, reg, info = normalize_row(row, errors, warnings)
+        if reg is None:
+            continue
+        page_regs = regs.setdefault(page, {})
+        if reg in page_regs:
+            warnings.append(f"row {n}: {info['name']} replaces {page_regs[reg]['name']} at page {page} {reg}")
+        page_regs[reg] = info
+
+    for page, page_regs in regs.items():
+        compile_page(page_regs, page) # Catch anything the decoders can't build
+    return regs, errors, warnings
+
+
+def decoder_state(dec: reg_decoder) -> Dict[str, Any]:
+    state = {attr: getattr(dec, attr) for attr in CHECK_ATTRS}
+    state["units"] = state["units"].strip() # " " and "" both print nothing after the value
+    if dec.format == "LINEAR":
+        state["result"] = type(dec.slope * 1 + dec.offset) # int vs float results
+    return state
+
+
+def check_against_json(regs: Dict[str, Dict[str, Dict[str, Any]]], reference: bytes) -> List[str]:
+    ''' Differences between the compiled registers and the device JSON, compared as built decoders '''
+    errors = []
+    try:
+        expected = json.loads(reference)
+    except ValueError as e:
+        return [f"reference JSON is not valid: {e}"]
+    for page in sorted(set(regs) | set(expected)):
+        got_page = regs.get(page, {})
+        want_page = expected.get(page, {})
+        for reg in sorted(set(got_page) | set(want_page), key=lambda r: int(r, 16)):
+            if reg not in got_page:
+                errors.append(f"page {page} {reg}: {want_page[reg].get('name', '')} is in the JSON but not the sheet")
+                continue
+            if reg not in want_page:
+                errors.append(f"page {page} {reg}: {got_page[reg]['name']} is in the sheet but not the JSON")
+                continue
+            got = decoder_state(reg_decoder(reg, got_page[reg], page))
+            want = decoder_state(reg_decoder(reg, want_page[reg], page))
+            for attr in got.keys() | want.keys():
+                if got.get(attr) != want.get(attr):
+                    errors.append(f"page {page} {reg} {got['name']}: {attr} is {got.get(attr)!r}, JSON has {want.get(attr)!r}")
+    return errors
+
+
+def compile_workbook(path: str, out_dir: str = OUT_DIR, force: bool = False, write_json: bool = False,
+                     check: bool = True) -> List[Dict[str, Any]]:
+    ''' Compile every sheet of a workbook. Returns one result dict per sheet '''
+    results = []
+    sheets = read_xlsx(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(out_dir, exist_ok=True)
+    for sheet, rows in sheets.items():
+        name = stem if len(sheets) == 1 else f"{stem}_{sheet}"
+        out_path = os.path.join(out_dir, name + PDEF_EXT)
+        reference = None
+        ref_path = os.path.join(os.path.dirname(path), name + ".json")
+        if check and os.path.exists(ref_path):
+            with open(ref_path, "rb") as f:
+                reference = f.read()
+        digest = sheet_hash(rows, reference)
+        result = {"source": path, "sheet": sheet, "output": out_path, "status": "unchanged", "errors": [], "warnings": []}
+        results.append(result)
+
+        if not force:
+            try:
+                if read_pdef(out_path, with_header=True)[0]["sha256"] == digest:
+                    continue
+            except (OSError, ValueError):
+                pass
+
+        regs, errors, warnings = normalize_sheet(rows)
+        if reference is not None and not errors:
+            errors.extend(check_against_json(regs, reference))
+        result["errors"] = errors
+        result["warnings"] = warnings
+        if errors:
+            result["status"] = "failed"
+            continue
+        write_pdef(out_path, regs, {"source": os.path.basename(path), "sheet": sheet, "sha256": digest})
+        if write_json:
+            with open(os.path.join(out_dir, name + ".json"), "w", encoding="utf-8") as f:
+                json.dump(regs, f, indent=4, ensure_ascii=False)
+        result["status"] = "compiled"
+        result["registers"] = sum(len(r) for r in regs.values())
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile device register spreadsheets")
+    parser.add_argument("workbooks", nargs="*", help="xlsx files. Default is devices/*.xlsx")
+    parser.add_argument("--out", default=OUT_DIR, help="Output folder for the .pdef files")
+    parser.add_argument("--force", action="store_true", help="Rebuild sheets that haven't changed")
+    parser.add_argument("--json", action="store_true", help="Also write the normalized register map as JSON")
+    parser.add_argument("--no-check", action="store_true", help="Don't compare the result with devices/<name>.json")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.workbooks or sorted(glob.glob(os.path.join(DEVICES_DIR, "*.xlsx"))):
+        for result in compile_workbook(path, args.out, args.force, args.json, not args.no_check):
+            count = f" ({result['registers']} registers)" if "registers" in result else ""
+            print(f"{result['status']:>9}: {os.path.basename(path)} [{result['sheet']}] -> {result['output']}{count}")
+            for msg in result["warnings"]:
+                print(f"   warning: {msg}")
+            for msg in result["errors"]:
+                print(f"   error: {msg}")
+            failed = failed or result["status"] == "failed"
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,261 @@
+''' Live decoding of analyzer streams with asyncio.
+
+    ingest -> tokenize -> decode -> sink, connected by bounded queues. When a later stage
+    falls behind the queues fill up and ingest stops reading, so the socket/pipe pushes
+    back on the analyzer instead of memory growing without limit.
+
+    python live.py tcp://127.0.0.1:5555
+    python live.py unix:///tmp/analyzer.sock
+    python live.py -                              (stdin)
+    python live.py --fake test_input.txt --rate 100000 --port 5555
+'''
+import sys
+import time
+import asyncio
+import argparse
+from typing import Optional, Callable
+
+from parmesean import Parmesean, tokenize, output_sink, terminal_sink
+
+READ_SIZE = 64 * 1024 # Bytes per read. One read becomes one batch of lines
+QUEUE_SIZE = 64 # Batches buffered between each stage
+
+
+async def open_source(source: str):
+    ''' Open tcp://host:port, unix:///path, a fifo path or - for stdin.
+        Returns (reader, transport or writer) - keep the second one open while reading '''
+    if source.startswith("tcp://"):
+        host, port = source[len("tcp://"):].rsplit(":", 1)
+        return await asyncio.open_connection(host, int(port))
+    if source.startswith("unix://"):
+        return await asyncio.open_unix_connection(source[len("unix://"):])
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=READ_SIZE)
+    pipe = sys.stdin.buffer if source == "-" else open(source, 'rb')
+    transport, protocol = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, transport
+
+
+async def ingest(reader: asyncio.StreamReader, out: asyncio.Queue):
+    ''' Read raw bytes and pass on complete lines in batches '''
+    partial = b""
+    while True:
+        chunk = await reader.read(READ_SIZE)
+        if not chunk:
+            break
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        if lines:
+            await out.put(lines)
+    if partial.strip():
+        await out.put([partial])
+    await out.put(None)
+
+
+async def tokenize_lines(parm: Parmesean, lines_in: asyncio.Queue, out: asyncio.Queue):
+    while True:
+        lines = await lines_in.get()
+        if lines is None:
+            break
+        frames = []
+        for line in lines:
+            if parm.recorder is not None:
+                parm.recorder.write(line)
+            frames.extend(tokenize(line, parm.filter))
+        if frames:
+            await out.put(frames)
+    await out.put(None)
+
+
+async def decode_frames(parm: Parmesean, frames_in: asyncio.Queue, out: asyncio.Queue):
+    # One decode task keeps the frames in order for the per device page/register state
+    while True:
+        frames = await frames_in.get()
+        if frames is None:
+            break
+        stats = parm.stats
+        delta = parm.delta
+        parse_frame = parm.parse_frame if parm.filter is None else parm.filter_frame
+        if stats is None:
+            results = [tr for tr in (parse_frame(*frame) for frame in frames) if tr is not None]
+            if delta is not None:
+                results = delta.filter(results)
+            if results:
+                await out.put(results)
+            continue
+
+        results = []
+        for frame in frames:
+            start = time.perf_counter_ns()
+            tr = parse_frame(*frame)
+            if tr is None:
+                continue
+            stats.add(tr, time.perf_counter_ns() - start)
+            results.append(tr)
+        if delta is not None:
+            results = delta.filter(results)
+        if results:
+            await out.put(results)
+    await out.put(None)
+
+
+async def run_sink(results_in: asyncio.Queue, sink: Callable) -> int:
+    ''' sink(transaction) can be a normal function or a coroutine function '''
+    count = 0
+    is_async = asyncio.iscoroutinefunction(sink)
+    while True:
+        results = await results_in.get()
+        if results is None:
+            break
+        for tr in results:
+            if is_async:
+                await sink(tr)
+            else:
+                sink(tr)
+        count += len(results)
+    return count
+
+
+async def run_output_sink(results_in: asyncio.Queue, sink: output_sink, stats = None, delta = None) -> int:
+    ''' Write to an output_sink. It is flushed whenever the queue runs empty, so output is
+        batched while the stream is busy and still shows up right away when it is quiet.
+        With a delta_filter its repeat counts are written every interval, even with no new results '''
+    count = 0
+    while True:
+        if delta is None:
+            results = await results_in.get()
+        else:
+            if delta.due():
+                sink.write_repeats(delta.take_repeats())
+                sink.flush()
+            wait = max(0.0, delta.interval - (delta.clock() - delta.last_report))
+            try:
+                results = await asyncio.wait_for(results_in.get(), wait)
+            except asyncio.TimeoutError:
+                continue
+        if results is None:
+            break
+        if stats is None:
+            for tr in results:
+                sink.write(tr)
+        else:
+            start = time.perf_counter_ns()
+            for tr in results:
+                sink.write(tr)
+            stats.render_ns += time.perf_counter_ns() - start
+        count += len(results)
+        if results_in.empty():
+            sink.flush()
+    if delta is not None:
+        sink.write_repeats(delta.take_repeats())
+    sink.flush()
+    return count
+
+
+async def decode_live(parm: Parmesean, source: str, sink = None, queue_size: int = QUEUE_SIZE) -> int:
+    ''' Decode a live stream until it closes. Returns the number of transactions sent to sink.
+        sink is an output_sink or a callable taking one transaction. The default is a terminal_sink
+        printing like the file decoder, closed when the stream ends. A sink passed in is flushed but left open.
+        An error in any stage (e.g. the connection being reset) stops the pipeline and is raised here.
+        Change-only mode (parm.enable_delta()) needs an output_sink for its repeat counts '''
+    if parm.delta is not None and sink is not None and not isinstance(sink, output_sink):
+        raise ValueError("Change-only mode needs an output_sink to report repeat counts")
+    owns_sink = sink is None
+    if owns_sink:
+        sink = terminal_sink(show_lines=False)
+
+    reader, conn = await open_source(source)
+    lines = asyncio.Queue(queue_size)
+    frames = asyncio.Queue(queue_size)
+    results = asyncio.Queue(queue_size)
+    stages = [
+        asyncio.create_task(ingest(reader, lines)),
+        asyncio.create_task(tokenize_lines(parm, lines, frames)),
+        asyncio.create_task(decode_frames(parm, frames, results)),
+    ]
+    if isinstance(sink, output_sink):
+        sink_task = asyncio.create_task(run_output_sink(results, sink, parm.stats, parm.delta))
+    else:
+        sink_task = asyncio.create_task(run_sink(results, sink))
+    tasks = stages + [sink_task]
+    try:
+        # A stage that fails never sends its None, so wait on every task and stop at the first error
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        count = sink_task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        conn.close()
+        if owns_sink:
+            sink.close()
+        elif isinstance(sink, output_sink) and sink.f is not None:
+            sink.flush()
+    return count
+
+
+async def fake_analyzer(path: str, host: str = "127.0.0.1", port: int = 5555, rate: float = 10000,
+                        unix_path: Optional[str] = None, loops: int = 1) -> asyncio.AbstractServer:
+    ''' Serve the lines of a capture file to every client at about rate lines/sec. rate=0 sends
+        as fast as the client reads. loops=0 repeats forever '''
+    with open(path, 'rb') as f:
+        lines = [line if line.endswith(b"\n") else line + b"\n" for line in f if line.strip()]
+
+    async def replay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        batch = max(1, int(rate / 100)) if rate else len(lines) # About 100 writes per second
+        start = time.monotonic()
+        sent = 0
+        n = 0
+        try:
+            while loops == 0 or n < loops:
+                for i in range(0, len(lines), batch):
+                    writer.write(b"".join(lines[i:i + batch]))
+                    await writer.drain() # Backpressure from the client
+                    sent += len(lines[i:i + batch])
+                    if rate:
+                        delay = start + sent / rate - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                n += 1
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    if unix_path is not None:
+        return await asyncio.start_unix_server(replay, unix_path)
+    return await asyncio.start_server(replay, host, port)
+
+
+async def serve_fake(args):
+    server = await fake_analyzer(args.fake, args.host, args.port, args.rate, args.unix, args.loops)
+    where = args.unix if args.unix else f"{args.host}:{args.port}"
+    print(f"Fake analyzer replaying {args.fake} at {args.rate} lines/s on {where}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode a live analyzer stream")
+    parser.add_argument("source", nargs="?", help="tcp://host:port, unix:///path, a fifo or - for stdin")
+    parser.add_argument("--fake", metavar="CAPTURE", help="Run a fake analyzer that replays CAPTURE instead")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--unix", help="Serve the fake analyzer on a unix socket")
+    parser.add_argument("--rate", type=float, default=10000, help="Fake analyzer lines/sec, 0 for unlimited")
+    parser.add_argument("--loops", type=int, default=1, help="Fake analyzer replays per client, 0 for forever")
+    args = parser.parse_args()
+
+    if args.fake:
+        asyncio.run(serve_fake(args))
+    elif args.source:
+        parm = Parmesean(verbose=True)
+        count = asyncio.run(decode_live(parm, args.source))
+        parm.close()
+        print(f"Decoded {count} transactions")
+    else:
+        parser.print_help()
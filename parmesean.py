@@ -1,15 +1,39 @@
 import json
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Iterator
 import os 
 import struct
 import re
+import sys
+import mmap
+import time
+import atexit
+import threading
+import cProfile
+import pstats
+import pickle
+import hashlib
+import bisect
+import io
+import contextlib
+import csv
+import glob
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from types import MappingProxyType
+from array import array
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:
+    np = None # Only needed for batch conversion
+
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 DEVICES_DIR = os.path.join(CURRENT_DIR, "devices")
 SETTINGS_FILE = os.path.join(CURRENT_DIR, "settings.json")
 OUT_DIR = os.path.join(CURRENT_DIR, "output")
-IN_FILE = os.path.join(CURRENT_DIR,"output\\20251113_170222.txt")
+CACHE_DIR = os.path.join(CURRENT_DIR, "cache") # Compiled device definitions
+IN_FILE = os.path.join(OUT_DIR, "20251113_170222.txt")
 
 DBG_NONE = 0
 DBG_MIN = 1
@@ -32,19 +56,18 @@ BMAGENTA = "\x1b[95m"
 BCYAN = "\x1b[96m"
 BWHITE = "\x1b[97m"
 ENDC= "\033[0m"
-# data_pattern = re.compile(r"0x([0-9a-fA-F]{2}) ")
-# addr_pattern = re.compile(r"\[(0x[0-9a-fA-F]{2})([RrWw]) ([-+])")
-
-# Generic pattern:
-#   0xAAW or 0xAAR
-#   followed by zero or more " + 0xDD" data bytes
-tr_pattern = re.compile(
-    r"\[(?P<addr>0x[0-9A-Fa-f]{2})(?P<rw>[WR])(?P<fack>[+-])(0x(?P<data>([0-9A-Fa-f]{2}))(?P<lack>[+-]))*"
-)  
-data_pattern = re.compile(
-    r"0x(?P<data>[a-fA-F0-9]{2})[-+]"
-)
-#     r"[+-](?P<data>(0x[0-9A-Fa-f]{2})*)"
+# Single pass frame tokenizer pattern. Every token is either a start/repeated start
+#   [0xAAW +    address, R/W and the address ACK
+#   0xDD +      data byte and its ACK
+# Whitespace between the pieces is optional so lines don't need to be cleaned first
+FRAME_PATTERN = r"\[\s*0x([0-9A-Fa-f]{2})\s*([RrWw])\s*([+-])|0x([0-9A-Fa-f]{2})\s*([+-])"
+frame_pattern = re.compile(FRAME_PATTERN)
+frame_pattern_b = re.compile(FRAME_PATTERN.encode()) # Same pattern for bytes lines
+
+# Token lookups that work for both str and bytes matches
+RW_TOKEN = {"W": "W", "w": "W", "R": "R", "r": "R", b"W": "W", b"w": "W", b"R": "R", b"r": "R"}
+ACK_TOKEN = {"+": True, "-": False, b"+": True, b"-": False}
+
 #Dirty hack to make the JSON colors easy
 COLOR = {
     "HLINE": HLINE,
@@ -65,20 +88,792 @@ COLOR = {
     "ENDC": ENDC,
 }
 
+L16_SCALE = pow(2, -12) # L16 values use a fixed exponent of -12
+NO_PAGE = (None,) * 256 # Empty register table for devices without a parser or unknown pages
+
+# Binary frame records for archival captures. The file starts with RECORD_FILE_HEADER, then one
+# RECORD_HEADER per frame followed by its payload bytes. Payloads are read in place as memoryview
+# slices of the mapped file, nothing is converted to or from hex text
+RECORD_MAGIC = b"PRMB"
+RECORD_VERSION = 1
+RECORD_FILE_HEADER = struct.Struct("<4sH") # magic, version
+RECORD_HEADER = struct.Struct("<BBH") # addr, flags, payload length
+REC_WRITE = 0x01
+REC_FACK = 0x02 # Address ACK
+REC_HAS_LACK = 0x04 # Set when the frame has data bytes
+REC_LACK = 0x08 # ACK of the last data byte
+
+
+
+def tokenize(line, flt: "frame_filter" = None) -> List[Tuple[int, str, bool, Optional[bool], bytearray]]:
+    ''' Scan one analyzer line (str or bytes) and return every frame in it as
+        (addr, rw, fack, lack, payload). A repeated start begins a new frame.
+        Frames whose address or address ACK flt rejects are dropped without reading their data '''
+    pattern = frame_pattern if isinstance(line, str) else frame_pattern_b
+    if flt is not None:
+        return tokenize_filtered(line, pattern, flt)
+    frames = []
+    frame = None
+    for addr, rw, fack, data, ack in pattern.findall(line):
+        if addr:
+            frame = [int(addr, 16), RW_TOKEN[rw], ACK_TOKEN[fack], None, bytearray()]
+            frames.append(frame)
+        elif frame is not None:
+            frame[4].append(int(data, 16))
+            frame[3] = ACK_TOKEN[ack]
+    return frames
+
+
+def tokenize_filtered(line, pattern, flt: "frame_filter"):
+    table = flt.addr_table
+    want_fack = flt.fack
+    frames = []
+    frame = None
+    for addr, rw, fack, data, ack in pattern.findall(line):
+        if addr:
+            addr = int(addr, 16)
+            fack = ACK_TOKEN[fack]
+            if table[addr] and (want_fack is None or fack == want_fack):
+                frame = [addr, RW_TOKEN[rw], fack, None, bytearray()]
+                frames.append(frame)
+            else:
+                frame = None # Skip this frame's data bytes
+        elif frame is not None:
+            frame[4].append(int(data, 16))
+            frame[3] = ACK_TOKEN[ack]
+    return frames
+
+
+FILTER_ACK = {"+": True, "ACK": True, "1": True, "TRUE": True, "-": False, "NACK": False, "0": False, "FALSE": False}
+
+
+class frame_filter:
+    ''' Compiled allow/deny filter. Address and address ACK checks run in the tokenizer against
+        a 256 entry table so rejected frames never have their data read. Register, R/W and last
+        ACK checks run before decoding. Rejected frames still update the device's last register
+        and page so later frames decode correctly.
+
+        addrs/regs - only these (None = all). deny_addrs/deny_regs - never these. Registers can be
+        numbers or register names. rw - "R" or "W". fack/lack - True for ACK, False for NACK.
+        known_only drops addresses that aren't in settings.json '''
+    def __init__(self, addrs = None, deny_addrs = (), regs = None, deny_regs = (), rw: Optional[str] = None,
+                 fack: Optional[bool] = None, lack: Optional[bool] = None, known_only: bool = False):
+        self.addrs = None if addrs is None else set(filter_int(a) for a in addrs)
+        self.deny_addrs = set(filter_int(a) for a in deny_addrs)
+        self.regs = None if regs is None else filter_regs(regs)
+        self.deny_regs = filter_regs(deny_regs)
+        self.rw = rw.upper() if rw else None
+        self.fack = fack
+        self.lack = lack
+        self.known_only = known_only
+        self.post = self.rw is not None or lack is not None or self.regs is not None or any(self.deny_regs)
+        self.compile()
+
+    def compile(self, known = None):
+        ''' Build the address table. known is the set of configured addresses for known_only '''
+        table = bytearray(256)
+        for addr in range(256):
+            table[addr] = ((self.addrs is None or addr in self.addrs) and addr not in self.deny_addrs
+                           and (not self.known_only or known is None or addr in known))
+        self.addr_table = bytes(table)
+
+    def accept_addr(self, addr: int, fack: bool) -> bool:
+        return bool(self.addr_table[addr]) and (self.fack is None or fack == self.fack)
+
+    def accept(self, dev: "i2c_device", rw: str, payload: bytes, lack: Optional[bool]) -> bool:
+        ''' Register, R/W and last ACK checks. Keeps dev's register and page up to date when rejecting '''
+        keep = (self.rw is None or rw == self.rw) and (self.lack is None or lack == self.lack)
+        if keep and (self.regs is not None or any(self.deny_regs)):
+            if len(payload) == 0:
+                keep = self.regs is None
+            else:
+                reg = payload[0] if rw == 'W' else dev.last_reg
+                dec = dev.page_table[reg]
+                name = None if dec is None else dec.name
+                if self.regs is not None:
+                    keep = reg in self.regs[0] or name in self.regs[1]
+                keep = keep and reg not in self.deny_regs[0] and name not in self.deny_regs[1]
+        if keep or len(payload) == 0:
+            return keep
+
+        # Not decoded, but the register write and page changes still count
+        reg, dec, data = dev.resolve(rw, payload)
+        if dec is not None and dec.format == "PAGE" and len(data) != 0:
+            dev.change_page(dec, data)
+        return False
+
+
+def filter_int(value) -> int:
+    return value if isinstance(value, int) else int(value, 16)
+
+
+def filter_regs(regs) -> Tuple[set, set]:
+    ''' (register numbers, register names) '''
+    nums = set()
+    names = set()
+    for r in regs:
+        if isinstance(r, int) or r.lower().startswith("0x"):
+            nums.add(filter_int(r))
+        else:
+            names.add(r)
+    return nums, names
+
+
+def compile_filter(expr: str) -> frame_filter:
+    ''' Filter from a string like "addr=0x44,0x45 reg!=0x00 rw=R ack=+ known".
+        Keys are addr, reg, rw, ack (address ACK) and lack (last data ACK). = allows,
+        != denies, values are comma separated. known drops unconfigured addresses.
+        Bad terms raise ValueError '''
+    args = {"known_only": False}
+    for term in expr.split():
+        if term.lower() == "known":
+            args["known_only"] = True
+            continue
+        deny = "!=" in term
+        key, _, values = term.partition("!=" if deny else "=")
+        key = key.lower()
+        values = [v for v in values.split(",") if v]
+        if not values:
+            raise ValueError(f"Bad filter term: {term}")
+        if key in ("addr", "reg"):
+            args[("deny_" if deny else "") + key + "s"] = values
+        elif key == "rw":
+            rw = {v.upper() for v in values}
+            if not rw <= {"R", "W"}:
+                raise ValueError(f"Bad filter term: {term}")
+            if deny:
+                rw = {"R", "W"} - rw # rw!=R is rw=W
+            if not rw:
+                raise ValueError(f"Filter term drops every frame: {term}")
+            args["rw"] = rw.pop() if len(rw) == 1 else None
+        elif key in ("ack", "lack") and values[0].upper() in FILTER_ACK:
+            ack = FILTER_ACK[values[0].upper()]
+            args["fack" if key == "ack" else "lack"] = (not ack) if deny else ack
+        else:
+            raise ValueError(f"Bad filter term: {term}")
+    return frame_filter(**args)
+
+
+def pack_record(addr: int, rw: str, fack: bool, lack: Optional[bool], payload) -> bytes:
+    ''' One binary frame record '''
+    flags = (REC_WRITE if rw == 'W' else 0) | (REC_FACK if fack else 0)
+    if lack is not None:
+        flags |= REC_HAS_LACK | (REC_LACK if lack else 0)
+    return RECORD_HEADER.pack(addr, flags, len(payload)) + bytes(payload)
+
+
+def write_records(path: str, frames) -> int:
+    ''' Write (addr, rw, fack, lack, payload) frames as a binary record file. Returns the frame count '''
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(RECORD_FILE_HEADER.pack(RECORD_MAGIC, RECORD_VERSION))
+        for frame in frames:
+            f.write(pack_record(*frame))
+            count += 1
+    return count
+
+
+def iter_records(buf) -> Iterator[Tuple[int, str, bool, Optional[bool], memoryview]]:
+    ''' Frames from a binary record buffer (bytes, mmap, ...). Payloads are memoryview slices
+        of buf, copy them with bytes() to keep them past the next frame '''
+    view = memoryview(buf)
+    magic, version = RECORD_FILE_HEADER.unpack_from(view, 0)
+    if magic != RECORD_MAGIC or version != RECORD_VERSION:
+        raise ValueError(f"Not a version {RECORD_VERSION} frame record file")
+
+    unpack = RECORD_HEADER.unpack_from
+    header = RECORD_HEADER.size
+    pos = RECORD_FILE_HEADER.size
+    end = len(view)
+    while pos < end:
+        addr, flags, length = unpack(view, pos)
+        pos += header
+        lack = bool(flags & REC_LACK) if flags & REC_HAS_LACK else None
+        yield addr, 'W' if flags & REC_WRITE else 'R', bool(flags & REC_FACK), lack, view[pos:pos + length]
+        pos += length
+
+
+def read_records(path: str):
+    ''' Frames from a binary record file, memory mapped '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The map closes itself once the last payload view is released
+    yield from iter_records(mm)
+
+
+CSV_TRUE = ("+", "1", "ACK", "TRUE", "Y", "YES")
+CSV_RW = {"W": "W", "WR": "W", "WRITE": "W", "R": "R", "RD": "R", "READ": "R"} # rw column values in CSV exports
+
+def read_csv_frames(source):
+    ''' Frames from a CSV export with a header row. Needs addr and rw columns, fack and lack are
+        optional. rw is R/W or Read/Write in any case. Data is either a hex "data" column ("8B 12 34"
+        or "0x8B1234") or one column per byte named d0, d1, ... Bad rows raise ValueError with the line number '''
+    f = open(source, 'r', newline='') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            return
+        fields = [name.strip().lower() for name in reader.fieldnames]
+        byte_cols = sorted((int(name[1:]), col) for name, col in zip(fields, reader.fieldnames)
+                           if name[:1] == "d" and name[1:].isdigit())
+        cols = dict(zip(fields, reader.fieldnames))
+        for name in ("addr", "rw"):
+            if name not in cols:
+                raise ValueError(f"CSV capture has no {name} column")
+        addr_col = cols["addr"]
+        rw_col = cols["rw"]
+        data_col = cols.get("data")
+        fack_col = cols.get("fack")
+        lack_col = cols.get("lack")
+
+        for row in reader:
+            try:
+                if data_col is not None:
+                    text = (row[data_col] or "").strip()
+                    payload = bytes.fromhex(text[2:] if text[:2].lower() == "0x" else text)
+                else:
+                    payload = bytes(int(row[col], 16) for _, col in byte_cols if row[col] not in (None, ""))
+                fack = (row[fack_col] or "+") if fack_col is not None else "+"
+                lack = (row[lack_col] or "") if lack_col is not None else ""
+                frame = (int(row[addr_col], 16), CSV_RW[row[rw_col].strip().upper()],
+                         fack.strip().upper() in CSV_TRUE,
+                         None if lack.strip() == "" else lack.strip().upper() in CSV_TRUE,
+                         payload)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"Bad CSV capture row at line {reader.line_num}: {e!r}") from None
+            yield frame
+    finally:
+        if f is not source:
+            f.close()
+
+
+def capture_format(path: str) -> str:
+    ''' "records", "csv" or "text" '''
+    with open(path, 'rb') as f:
+        if f.read(len(RECORD_MAGIC)) == RECORD_MAGIC:
+            return "records"
+    return "csv" if os.fspath(path).lower().endswith(".csv") else "text"
+
+
+def require_text_capture(path: str, what: str):
+    # Byte offset based decoding (chunks, index checkpoints) only works on the text format
+    fmt = capture_format(path)
+    if fmt != "text":
+        raise ValueError(f"{what} needs a text capture, {path} is a {fmt} capture. Use parse_file() instead")
+
+
+def hex_str(data) -> str:
+    ''' Display helper - payload bytes as a 0xAABB.. string '''
+    return '0x' + data.hex().upper()
+
+
+class reg_decoder:
+    ''' Compiled register description. Built once when the device JSON is loaded so
+        parse() only has to index the page table and call the bound converter '''
+    __slots__ = ("reg", "page", "name", "format", "units", "slope", "offset", "signed", "endian", "deadband", "fields",
+                 "convert", "text", "text_plain", "table")
+
+    def __init__(self, reg: str, info: Dict[str, Any], page: Optional[str] = None):
+        self.reg = reg
+        self.page = page # Page this register belongs to
+        self.name = info.get("name", "")
+        fmt = info.get("format")
+        self.format = fmt.upper() if isinstance(fmt, str) else None
+        units = info.get("units", "")
+        self.units = "" if units is None or units == "NaN" else units
+        self.slope = info.get("slope", 1)
+        self.offset = info.get("offset", 0)
+        signed = info.get("signed", False)
+        self.signed = signed == "True" if isinstance(signed, str) else bool(signed) # JSON files use bool, float and str for this
+        self.endian = info.get("endian", "big")
+        deadband = info.get("deadband")
+        self.deadband = float(deadband) if isinstance(deadband, (int, float)) and deadband == deadband else 0.0 # Change-only output threshold
+
+        # Bind the converter for this format. Unknown or missing formats return the raw data
+        self.convert = getattr(self, f"conv_{self.format.lower()}", self.conv_raw) if self.format else self.conv_raw
+        self.table = None # Shared 64K lookup table for 16 bit words, attached on the first conversion
+        if self.format in TABLE_FORMATS:
+            self.convert = self.conv_first
+        # Matching formatter used when a transaction is rendered
+        self.text = self.text_hex if self.convert == self.conv_raw else getattr(self, f"text_{self.format.lower()}", self.text_value)
+        self.text_plain = self.text
+
+        # Named bit fields for REG/BIT/BIN registers as (name, mask, shift)
+        self.fields = compile_fields(info.get("fields"))
+        if self.fields and self.format not in BIT_FORMATS:
+            raise ValueError(f"{self.name}({reg}): bit fields need a {'/'.join(BIT_FORMATS)} register, not {self.format}")
+        if self.fields:
+            self.text = self.text_flags
+
+    def conv_raw(self, data: bytes):
+        return bytes(data)
+
+    # L11/L16/LINEAR words have only 65,536 possible values. The first conversion attaches the
+    # table for this format (and slope/offset) and switches convert over to a plain index
+    def conv_first(self, data: bytes):
+        self.table = conv_table(self.table_key())
+        self.convert = self.conv_table_linear if self.format == "LINEAR" else self.conv_table_word
+        return self.convert(data)
+
+    def table_key(self) -> tuple:
+        if self.format != "LINEAR":
+            return (self.format,)
+        # Types are part of the key, 1 and 1.0 give int and float results
+        return (self.format, type(self.slope), self.slope, type(self.offset), self.offset, self.signed)
+
+    def conv_table_word(self, data: bytes):
+        return self.table[int.from_bytes(data[:2], 'little')]
+
+    def conv_table_linear(self, data: bytes):
+        if len(data) != 2:
+            return self.conv_linear(data)
+        return self.table[int.from_bytes(data, self.endian)]
+
+    def conv_hex(self, data: bytes):
+        return bytes(data)
+
+    #Normal MX+B fit
+    def conv_linear(self, data: bytes):
+        return self.slope * int.from_bytes(data, self.endian, signed=self.signed) + self.offset
+
+    def conv_reg(self, data: bytes):
+        return int.from_bytes(data, 'big')
+
+    # M * 2^-12, PMBus words are sent low byte first
+    # b'\x5B\x34'  = 5.7 in L16
+    def conv_l16(self, data: bytes):
+        return int.from_bytes(data[:2], 'little') * L16_SCALE
+
+    # b'\xDA\x80'  = 20 IN L11
+    def conv_l11(self, data: bytes):
+        return l11_to_float(int.from_bytes(data[:2], 'little'))
+
+    def conv_asc(self, data: bytes):
+        return str(data, 'utf-8', errors='replace') # Works for bytes and memoryview
+
+    def conv_bin(self, data: bytes):
+        return bytes(data)
+
+    # Returns the requested page. The device decides if it exists
+    def conv_page(self, data: bytes):
+        return str(data[0])
+
+    # Value to text with units. None is a command without data
+    def text_value(self, value):
+        return self.units if value is None else f"{value}{self.units}"
+
+    def text_hex(self, value):
+        return self.units if value is None else f"{hex_str(value)}{self.units}"
+
+    def text_reg(self, value):
+        return self.units if value is None else f"0b{value:0>16b}{self.units}"
+
+    def text_bin(self, value):
+        return self.units if value is None else format(int.from_bytes(value, 'big'), f'0{len(value) * 8}b') + self.units
+
+    # Normal text followed by the set bit fields
+    def text_flags(self, value):
+        # Flags go between the value and the units
+        names = self.active(value) if value is not None else None
+        if not names:
+            return self.text_plain(value)
+        text = self.text_plain(value)
+        if self.units and text.endswith(self.units):
+            text = text[:-len(self.units)]
+        return f"{text} [{', '.join(names)}]{self.units}"
+
+    def flags(self, value) -> Dict[str, int]:
+        ''' Every bit field of a converted value, {name: field value} '''
+        bits = value if isinstance(value, int) else int.from_bytes(value, 'big')
+        return {name: (bits & mask) >> shift for name, mask, shift in self.fields}
+
+    def active(self, value) -> List[str]:
+        ''' Names of the non zero bit fields '''
+        bits = value if isinstance(value, int) else int.from_bytes(value, 'big')
+        return [name for name, mask, shift in self.fields if bits & mask]
+
+
+def compile_fields(spec) -> Tuple[Tuple[str, int, int], ...]:
+    ''' Bit fields from the device JSON to (name, mask, shift). spec maps a name to a bit number (7),
+        a "hi:lo" range ("15:8") or [hi, lo]. Bits count from the LSB of the converted value '''
+    if not spec:
+        return ()
+    fields = []
+    for name, bits in spec.items():
+        if isinstance(bits, str):
+            hi, _, lo = bits.partition(":")
+            hi = int(hi)
+            lo = int(lo) if lo else hi
+        elif isinstance(bits, (list, tuple)):
+            hi, lo = int(bits[0]), int(bits[-1])
+        else:
+            hi = lo = int(bits)
+        if hi < lo:
+            hi, lo = lo, hi
+        fields.append((name, ((1 << (hi - lo + 1)) - 1) << lo, lo))
+    return tuple(fields)
+
+
+def l11_to_float(val_u16: int):
+    mantissa = val_u16 & 0x07FF #Mask the lower 11 bits
+    exp = (val_u16 >> 11) & 0x1F
+
+    if mantissa & 0x0400: #Signed bit - Convert 2s complement
+        mantissa -= 0x0800
+
+    if exp & 0x10: #Check 5th bit for sign
+        exp -= 0x20
+
+    return mantissa * (2**exp)
+
+
+TABLE_FORMATS = ("L11", "L16", "LINEAR") # Formats converted through a 64K lookup table
+BIT_FORMATS = ("REG", "BIT", "BIN") # Formats that can have bit fields, collected as up to 64 bit words in batch mode
+CONV_TABLES = {} # table_key -> 65,536 entry tuple, shared by every decoder with the same conversion
+CONV_ARRAYS = {} # table_key -> the same table as a numpy array for batch_convert
+
+
+def conv_table(key: tuple) -> tuple:
+    ''' Lookup table for every 16 bit word. Built from the scalar converters so the values
+        (and int/float types) are exactly what they return '''
+    table = CONV_TABLES.get(key)
+    if table is None:
+        fmt = key[0]
+        if fmt == "L11":
+            table = tuple(l11_to_float(word) for word in range(0x10000))
+        elif fmt == "L16":
+            table = tuple(word * L16_SCALE for word in range(0x10000))
+        else:
+            _, _, slope, _, offset, signed = key
+            table = tuple(slope * (word - 0x10000 if signed and word & 0x8000 else word) + offset for word in range(0x10000))
+        CONV_TABLES[key] = table
+    return table
+
+
+def conv_array(dec: "reg_decoder"):
+    key = dec.table_key()
+    arr = CONV_ARRAYS.get(key)
+    if arr is None:
+        arr = CONV_ARRAYS[key] = np.array(conv_table(key), dtype=np.float64)
+    return arr
+
+
+# Transaction status
+TR_OK = 0 # Register found and decoded
+TR_NO_DATA = 1 # Address only, no payload
+TR_UNKNOWN_REG = 2 # No decoder for the register on the current page
+TR_IGNORED = 3 # Address is in the ignore list
+
+ACK_TEXT = {True: '+', False: '-', None: None}
+
+
+class transaction:
+    ''' Compact decoded transaction. Only the numeric fields are stored, the display
+        strings are built when a field is asked for. Supports result['key'] for the
+        old dict style access '''
+    __slots__ = ("addr", "rw", "fack", "lack", "payload", "reg", "value", "status", "dev", "dec", "memo")
+
+    def __init__(self, addr: int, rw: str, fack: bool, lack: Optional[bool], payload: bytes,
+                 reg: Optional[int] = None, value = None, status: int = TR_NO_DATA, dev = None, dec: reg_decoder = None,
+                 memo: Optional[list] = None):
+        self.addr = addr # Integer I2C address
+        self.rw = rw
+        self.fack = fack # Address ACK
+        self.lack = lack # ACK of the last data byte, None without data
+        self.payload = payload # All data bytes including the register
+        self.reg = reg
+        self.value = value # Converted value (float, int, str or bytes). None for commands without data
+        self.status = status
+        self.dev = dev # i2c_device or None when ignored
+        self.dec = dec # reg_decoder or None
+        self.memo = memo # Shared [value, text] entry from decode_cache, None when not memoized
+
+    # Data bytes after the register
+    @property
+    def data(self) -> bytes:
+        return self.payload[1:] if self.rw == 'W' else self.payload
+
+    def text(self, key: str):
+        ''' Render a single field as text. Same keys as the old result dicts '''
+        if key == 'addr':
+            return self.dev.addr if self.dev is not None else f"0x{self.addr:02X}"
+        if key == 'name':
+            return self.dev.name if self.dev is not None else ""
+        if key == 'rw':
+            return self.rw
+        if key == 'fack':
+            return 'ACK' if self.fack else 'NACK'
+        if key == 'lack':
+            return ACK_TEXT[self.lack]
+        if key == 'color':
+            return self.dev.color if self.dev is not None else ""
+
+        status = self.status
+        if key == 'reg':
+            if status == TR_IGNORED:
+                return ""
+            return "NO DATA" if status == TR_NO_DATA else f"0x{self.reg:02X}"
+        if key == 'reg_name':
+            return self.dec.name if self.dec is not None else ""
+        if key == 'raw':
+            return "" if status == TR_IGNORED else hex_str(self.payload)
+        if key == 'data':
+            if status == TR_UNKNOWN_REG:
+                return hex_str(self.data) if self.data else ""
+            return hex_str(self.payload)
+        if key == 'result':
+            if status == TR_OK:
+                memo = self.memo
+                if memo is None:
+                    return self.dec.text(self.value)
+                if memo[1] is None: # First render of this cached value
+                    memo[1] = self.dec.text(self.value)
+                return memo[1]
+            if status == TR_UNKNOWN_REG:
+                return hex_str(self.data) if self.data else ""
+            return "(IGNORED)" if status == TR_IGNORED else hex_str(self.payload)
+        raise KeyError(key)
+
+    __getitem__ = text
+
+    def flags(self) -> Dict[str, int]:
+        ''' Named bit fields of the value, empty when the register has none '''
+        dec = self.dec
+        if self.status != TR_OK or self.value is None or dec is None or not dec.fields:
+            return {}
+        return dec.flags(self.value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: self.text(key) for key in RESULT_KEYS}
+
+    def __repr__(self):
+        return f"transaction({self.as_dict()})"
+
+
+RESULT_KEYS = ('addr', 'name', 'reg', 'reg_name', 'data', 'rw', 'fack', 'lack', 'color', 'result', 'raw')
+
+
+class transaction_array:
+    ''' Struct of arrays container for bulk results. Each column is an array so millions
+        of transactions cost a few bytes each. Payloads are packed into one bytearray '''
+    def __init__(self):
+        self.addr = array('B')
+        self.rw = array('B') # 0 = W, 1 = R
+        self.fack = array('b')
+        self.lack = array('b') # -1 when there was no data
+        self.reg = array('h') # -1 when there was no register
+        self.status = array('B')
+        self.value = array('d') # NaN for values that aren't numeric
+        self.payload = bytearray()
+        self.offsets = array('Q', [0]) # payload i is payload[offsets[i]:offsets[i + 1]]
+
+    def append(self, tr: transaction):
+        self.addr.append(tr.addr)
+        self.rw.append(tr.rw == 'R')
+        self.fack.append(tr.fack)
+        self.lack.append(-1 if tr.lack is None else tr.lack)
+        self.reg.append(-1 if tr.reg is None else tr.reg)
+        self.status.append(tr.status)
+        value = tr.value
+        self.value.append(value if isinstance(value, (int, float)) else float('nan'))
+        self.payload += tr.payload
+        self.offsets.append(len(self.payload))
+
+    def extend(self, transactions):
+        for tr in transactions:
+            self.append(tr)
+
+    def __len__(self):
+        return len(self.addr)
+
+    def __getitem__(self, i: int) -> Tuple[int, str, bool, Optional[bool], int, int, float, bytes]:
+        ''' Row i as (addr, rw, fack, lack, reg, status, value, payload) '''
+        lack = self.lack[i]
+        reg = self.reg[i]
+        return (self.addr[i], 'R' if self.rw[i] else 'W', bool(self.fack[i]), None if lack < 0 else bool(lack),
+                None if reg < 0 else reg, self.status[i], self.value[i], bytes(self.payload[self.offsets[i]:self.offsets[i + 1]]))
+
+
+DEF_FIELDS = ("name", "format", "units", "slope", "offset", "signed", "endian", "length", "deadband", "fields") # Register fields the decoders use
+CACHE_VERSION = 3 # Bump when the cached register map layout changes
+
+DEVICE_DEFS = {} # Loaded device_defs by absolute path, shared by every device using the file
+
+
+class device_def:
+    ''' Read only register map compiled from one device JSON file. One instance is shared by
+        every i2c_device using the same file. Per device state (page, last register) lives
+        on the i2c_device '''
+    __slots__ = ("path", "regs", "pages", "default_page", "stamp", "page_regs")
+
+    def __init__(self, path: str, regs: Dict[str, Dict[str, Dict[str, Any]]], stamp: Tuple[int, int] = (0, 0)):
+        self.path = path
+        self.regs = regs # Trimmed JSON register map {page: {reg: {field: value}}}
+        self.stamp = stamp # (mtime_ns, size) of the JSON file this was built from
+        # Compiled tables. One 256 entry tuple of reg_decoder per page, indexed by register
+        self.pages = MappingProxyType({page: compile_page(page_regs, page) for page, page_regs in regs.items()})
+        self.default_page = next(iter(regs), None)
+        # Registers that are a PAGE command on every page. Writing them sets the page no matter which page we were on
+        self.page_regs = frozenset(reg for reg in range(256)
+                                   if all(t[reg] is not None and t[reg].format == "PAGE" for t in self.pages.values()))
+
+
+def compile_page(regs: Dict[str, Dict[str, Any]], page: Optional[str] = None) -> Tuple[Optional[reg_decoder], ...]:
+    table = [None] * 256
+    for reg, info in regs.items():
+        table[int(reg, 16)] = reg_decoder(reg, info, page)
+    return tuple(table)
+
+
+def load_device_def(path: str, cache_dir: Optional[str] = CACHE_DIR) -> device_def:
+    ''' Load a device JSON file once per process. The trimmed register map is also cached on disk
+        in cache_dir keyed by the file mtime/size and content hash. cache_dir=None skips the disk cache '''
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    definition = DEVICE_DEFS.get(path)
+    if definition is not None and definition.stamp == stamp:
+        return definition
+
+    regs = None
+    cache_file = None
+    if path.endswith(PDEF_EXT): # Already compiled by compile_devices.py
+        regs = read_pdef(path)
+    elif cache_dir is not None:
+        cache_file = os.path.join(cache_dir, f"{os.path.basename(path)}.{hashlib.sha1(path.encode()).hexdigest()[:12]}.pickle")
+        regs = read_def_cache(cache_file, path, stamp)
+
+    if regs is None:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        regs = {page: {reg: {k: info[k] for k in DEF_FIELDS if k in info} for reg, info in page_regs.items()}
+                for page, page_regs in json.loads(raw).items()}
+        if cache_file is not None:
+            write_def_cache(cache_file, stamp, hashlib.sha256(raw).hexdigest(), regs)
+
+    definition = device_def(path, regs, stamp)
+    DEVICE_DEFS[path] = definition
+    return definition
+
+
+def read_def_cache(cache_file: str, path: str, stamp: Tuple[int, int]):
+    ''' Returns the cached register map or None if the cache is missing or stale '''
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return None
+    if tuple(cache['stamp']) == stamp:
+        return cache['regs']
+
+    # Touched but maybe not changed. Compare the content hash before recompiling
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    if digest != cache['sha256']:
+        return None
+    write_def_cache(cache_file, stamp, digest, cache['regs'])
+    return cache['regs']
+
+
+PDEF_EXT = ".pdef" # Definitions compiled ahead of time from the device spreadsheets
+PDEF_VERSION = 1
+
+
+def read_pdef(path: str, with_header: bool = False):
+    ''' Register map from a compiled definition. With with_header returns (header, regs) '''
+    with open(path, 'rb') as f:
+        try:
+            data = pickle.load(f)
+        except (pickle.PickleError, EOFError, AttributeError) as e:
+            raise ValueError(f"Bad compiled definition {path}: {e}")
+    if not isinstance(data, dict) or data.get('version') != PDEF_VERSION:
+        raise ValueError(f"{path} is not a version {PDEF_VERSION} compiled definition")
+    return (data['header'], data['regs']) if with_header else data['regs']
+
+
+def write_pdef(path: str, regs, header: Dict[str, Any]):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump({'version' : PDEF_VERSION, 'header' : header, 'regs' : regs}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def write_def_cache(cache_file: str, stamp: Tuple[int, int], digest: str, regs):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({'version' : CACHE_VERSION, 'stamp' : stamp, 'sha256' : digest, 'regs' : regs}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass # The cache is only an optimization
+
+
+MEMO_SIZE = 4096 # Default number of decoded values kept by decode_cache
+
+
+class decode_cache:
+    ''' LRU cache of converted values for repeated polling transactions. Keyed on (reg_decoder, data).
+        A reg_decoder belongs to one device definition, page and register, so after a PAGE
+        change the lookup uses a different decoder and never returns the old page's value '''
+    __slots__ = ("size", "entries", "hits", "misses")
+
+    def __init__(self, size: int = MEMO_SIZE):
+        self.size = size
+        self.entries = OrderedDict() # (dec, data) -> [value, text or None], oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dec: reg_decoder, data: bytes) -> list:
+        ''' [value, text] for data converted by dec. text is filled in on the first render '''
+        if type(data) is not bytes:
+            data = bytes(data)
+        key = (dec, data)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = [dec.convert(data), None]
+        self.entries[key] = entry
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"size": self.size, "entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
 
 
 class i2c_device:
-    def __init__(self, name: str, addr: str, desc: str, cmd_length: int, json_path: os.path, debug: int, color: str):
+    def __init__(self, name: str, addr: str, desc: str, cmd_length: int, json_path: os.path, debug: int, color: str,
+                 cache_dir: Optional[str] = CACHE_DIR):
         self.addr = addr
         self.page_addr = None #Stores the current page address. Use the page format commands to change this 
         self.name = name
         self.desc = desc # Device Description
         self.path = json_path
-        self.regs = None
+        self.cache_dir = cache_dir
+        self.definition = None # Shared device_def, loaded on the first transaction
+        self.loaded = self.path == ""
+        self.page_table = NO_PAGE # Compiled table for the current page
         self.debug = debug
         self.color = COLOR["WHITE"]
         self.cmd_length = cmd_length
-        self.last_reg = "0x00" # Stores the lest register written to. Works similar to page_addr, if we get a read without a write, return the last known register
+        self.last_reg = 0x00 # Stores the lest register written to. Works similar to page_addr, if we get a read without a write, return the last known register
+        self.memo = None # Shared decode_cache, set by Parmesean.enable_memo()
 
         try:
             self.color = COLOR[color]
@@ -88,228 +883,120 @@ class i2c_device:
         
         self.printc_line_msg(f"Creating Device: {self.name} @ {self.addr} Debug: {self.debug}", DBG_MIN, self.color)
         if self.path != "":
-            try:
-                self.printc(f"Opening device settings at: {self.path}", DBG_MAX, self.color)
-                with open(self.path, 'r', encoding='utf-8') as f:
-                    self.regs = json.load(f)
-                    
-                    # Count number of registers per page
-
-                    if self.debug >= DBG_MIN:
-                        num_pages = len(self.regs)
-                        self.printc(f"Num Pages: {num_pages}", DBG_MIN, self.color)
-                        
-                        for page in self.regs:
-                            num_regs = len(self.regs[page])
-                            self.printc(f"{self.name} Page {page} has {num_regs}", DBG_MIN, self.color)
-                            self.printc(f"Page {page} Register List:", DBG_MAX, self.color)
-                            for addr in self.regs[page]:
-
-                                name = self.regs[page][addr]["name"]
-                                self.printc(f"     {addr} {name}", DBG_MAX, self.color)
-                                # print(f"{self.regs[reg]}")
-                    
-                    self.page_addr = next(iter(self.regs))
-                    self.printc(f"Default Page: {self.page_addr}", DBG_MIN, self.color)
-
-            except Exception as e:
-                self.printc(f"Json Read Error: {self.path}. Using default parser", DBG_NONE, self.color)
-                print(f"Exception: {e}")
-                return None
-            
-            
+            self.printc(f"Device settings: {self.path} (loaded on first use)", DBG_MAX, self.color)
         else: 
             self.printc(f"No JSON data provided for ({self.name})", DBG_MIN, self.color)
             self.page_addr = '0x00'
         
 
-    def parse(self, rw: str, data: str, fack: str, lack:str):
-        rw = rw
-        reg = ""
-        reg_name = ""
-        result = {
-            'addr' : self.addr,
-            'name' : self.name,
-            'reg' : "NO DATA",
-            'reg_name' : "",
-            'data' : data,
-            'rw' : rw,
-            "fack" : fack,
-            "lack" : lack,
-            "color" : self.color,
-            "result" : data,
-            "raw" : data
-        }
-        #return right away if no data
-        if len(data) < 4:
-            self.printc(f"{self.name}({self.addr}) {rw} ({fack}): (NO DATA) ", DBG_MIN, self.color)
-            return result
+    def load(self):
+        ''' Attach the shared register map. Called on the first transaction to this device '''
+        self.loaded = True
+        try:
+            self.printc(f"Opening device settings at: {self.path}", DBG_MAX, self.color)
+            self.definition = load_device_def(self.path, self.cache_dir)
+        except Exception as e:
+            self.printc(f"Json Read Error: {self.path}. Using default parser", DBG_NONE, self.color)
+            print(f"Exception: {e}")
+            return
+
+        # Count number of registers per page
+        if self.debug >= DBG_MIN:
+            regs = self.definition.regs
+            self.printc(f"Num Pages: {len(regs)}", DBG_MIN, self.color)
+            for page in regs:
+                self.printc(f"{self.name} Page {page} has {len(regs[page])}", DBG_MIN, self.color)
+                self.printc(f"Page {page} Register List:", DBG_MAX, self.color)
+                for addr in regs[page]:
+                    self.printc(f"     {addr} {regs[page][addr]['name']}", DBG_MAX, self.color)
+
+        self.set_page(self.definition.default_page)
+        self.printc(f"Default Page: {self.page_addr}", DBG_MIN, self.color)
+
+    @property
+    def regs(self):
+        if not self.loaded:
+            self.load()
+        return None if self.definition is None else self.definition.regs
+
+    @property
+    def pages(self):
+        if not self.loaded:
+            self.load()
+        return {} if self.definition is None else self.definition.pages
+
+    def set_page(self, page_addr: str):
+        self.page_addr = page_addr
+        self.page_table = self.pages.get(page_addr, NO_PAGE)
+
+    def reset(self):
+        ''' Back to the power on page and register '''
+        self.last_reg = 0x00
+        if self.path == "":
+            self.page_addr = '0x00'
+        elif self.definition is not None:
+            self.set_page(self.definition.default_page)
 
+    def resolve(self, rw: str, data: bytes):
+        ''' Find the register for a frame with data. Returns (reg, decoder or None, data without the register) '''
+        if not self.loaded:
+            self.load()
 
-        # Check for Write  and data is at least 0xAA - store the first register as the command
+        # Check for Write - store the first byte as the command register
         if rw == 'W':
-            reg = data[0:4]
+            reg = data[0]
             self.last_reg = reg # Update register 
-            data = "" if len(data) == 4 else '0x' + data[4:] 
+            data = data[1:]
         else:
             reg = self.last_reg
 
+        # Look for a valid register in the compiled page table
+        return reg, self.page_table[reg], data
 
+    def change_page(self, dec: reg_decoder, data: bytes) -> str:
+        page_addr = dec.convert(data)
+        if page_addr in self.pages:
+            self.printc(f"New Page Address: {page_addr}", DBG_MIN, self.color)
+            self.set_page(page_addr)
+            return f"New Page Address: {page_addr}"
 
-        # Look for a valid register name in the JSON
-        try:
-            reg_name = self.regs[self.page_addr].get(reg)["name"]
-        except:
-            #Use the hex string for name if no info available
-            self.printc(f"Reg not found: {reg}", DBG_MIN, self.color)
-                    # Update results with the parsed command
-            result['reg'] = reg
-            result['reg_name'] = ""
-            if data is None:
-                data = "NO DATA"
-            result['result'] = f"{data}"
-            result['data'] = data
-            return result
-
-        self.printc("Register Conversion", DBG_MAX, self.color)
-        self.printc(f"{self.name}({self.addr}) {rw}:({reg}) {reg_name} {data}", DBG_MIN, self.color)     
-        #run this when transaction is complete to do any unit conversion
-        output = f"({reg}) {reg_name} {data}"
-
-        try:
-            type = self.regs[self.page_addr][reg]["format"].upper()
-            self.printc(f"Reg Type: {type}", DBG_MAX, self.color)
-        except:
-            self.printc(f"No type data available for {reg}", DBG_MIN, self.color)
+        self.printc(f"No Matching Page Address for: {page_addr}", DBG_NONE, self.color)
+        return f"No Matching Page Address for: {page_addr}"
 
-        try: 
-            units = self.regs[self.page_addr][reg]["units"] if self.regs[self.page_addr][reg]["units"] != "NaN" else ""
-        except:
-            self.printc(f"No Units for: {reg}", DBG_MAX, self.color)
-            units = ""
-
-        # No data - Just a command
+    def parse(self, addr: int, rw: str, data: bytes, fack: bool, lack: Optional[bool]) -> transaction:
+        #return right away if no data
         if len(data) == 0:
-            conv = ""
-        #Normal MX+B fit + Units
-        elif type == "LINEAR":
-            signed = True if self.regs[self.page_addr][reg]["signed"] == "True" else False
-            byteorder = self.regs[self.page_addr][reg]["endian"] #Little or big
-            data_to_conv = data
-            if byteorder == 'little':
-                data_to_conv = data[0:2] + data[3:4] + data[2:3]
-
-            conv = int(data_to_conv, 16)
-            conv = self.regs[self.page_addr][reg]["slope"] * conv + self.regs[self.page_addr][reg]["offset"]
-            self.printc(f"Byte > Float : {conv}", DBG_MIN, self.color)
-
-            
-        elif type == "REG":
-            # data = data[2:]
-            length = 16
-            temp = int(data, 16)
-            conv = f"0b{temp:0>16b}"
-
-
-        elif type == "L16":
-            # M * 2^-12
-            # b'\x5B\x34'  = 5.7 in L16
-            # byteorder = self.regs[reg]["endian"] #Little or big
-            byte_data = '0x5B34'
-            # byte_data = data[:2] + data[4:6] + data[2:4]
-            test_output = int(byte_data, 16) * pow(2, -12)     
-            self.printc(f"Test Float (0x5B34) > (5.7): {test_output}", DBG_MAX, self.color)   
-
-            byte_data = '0x1133'
-            # byte_data = data[:2] + data[4:6] + data[2:4]
-            test_output = int(byte_data, 16) * pow(2, -12)    
-            self.printc(f"Test Float (0x1133) > (1.075): {test_output}", DBG_MAX, self.color)  
-            byte_data = '0x3EA8'
-            byte_data = data[:2] + data[4:6] + data[2:4]
-            test_output = int(byte_data, 16) * pow(2, -12)    
-            self.printc(f"Test Float (0x3EA8) > (0.979): {test_output}", DBG_MAX, self.color)  
-            
-            # byte_data = data[:2] + data[4:6] + data[2:4]
-            byte_data = byte_data = data[:2] + data[4:6] + data[2:4]
-            conv = int(byte_data, 16) * pow(2, -12)    
-
-            self.printc(f"Byte > L16 {byte_data} : {conv}", DBG_MIN, self.color)
-            
-        
-        elif type == "L11":
-            # b'\xDA\x80'  = 20 IN L11
-            #Test data
-            byte_data = "0xDA80"
-            val_u16 = int(byte_data, 16)
-            mantissa = val_u16 & 0x07FF #Mask the lower 11 bits
-            exp = (val_u16 >> 11) & 0x1F
-
-            if mantissa & 0x0400: #Signed bit - Convert 2s complement
-                mantissa -= 0x0800
-
-            if exp & 0x10: #Check 5th bit for sign
-                exp -= 0x20
-
-            conv = mantissa * (2**exp)
-            self.printc(f"TEST L11: 0xDA80 ({bin(0xda80)}) > 20", DBG_MIN, self.color)
-            self.printc(f"TEST Man: {mantissa}, Exp: {exp}, conv: {conv}", DBG_MAX, self.color)
-
-            # swap the bytes around for little endian
-            byte_data = data[:2] + data[4:6] + data[2:4]
-            val_u16 = int(byte_data, 16)
-            mantissa = val_u16 & 0x07FF #Mask the lower 11 bits
-            exp = (val_u16 >> 11) & 0x1F
-
-            if mantissa & 0x0400: #Signed bit - Convert 2s complement
-                mantissa -= 0x0800
-
-            if exp & 0x10: #Check 5th bit for sign
-                exp -= 0x20
+            if self.debug >= DBG_MIN:
+                self.printc(f"{self.name}({self.addr}) {rw} ({fack}): (NO DATA) ", DBG_MIN, self.color)
+            return transaction(addr, rw, fack, lack, data, None, None, TR_NO_DATA, self)
 
-            conv = mantissa * (2**exp)
-            # b'\xCAA6' = 5.297 in L11 
-            self.printc(f"L11: {byte_data} ({bin(val_u16)})", DBG_MIN, self.color)
-            self.printc(f"Man: {mantissa}, Exp: {exp}, conv: {conv}", DBG_MIN, self.color)
-
-
-        elif type == "ASC":
-            conv = data.decode('utf-8')
-        
-        elif type == "BIN":
-            conv = ''.join(f'{byte:08b}' for byte in data)
-
-        elif type == "HEX":
-            conv = data
-
-        elif type == "PAGE": # Change the current page address
-            self.printc(f"PAGE COMMAND", DBG_MIN, self.color)
-            page_addr = str(int(data[0:4], 16))
-            
-
-            if page_addr in self.regs:
-                self.printc(f"Current Page Address: {page_addr}", DBG_MIN, self.color)
-                self.printc(f"New Page Address: {page_addr}", DBG_MIN, self.color)
-                conv = f"New Page Address: {page_addr}"
+        payload = data
+        reg, dec, data = self.resolve(rw, data)
+        if dec is None:
+            #Use the hex string for name if no info available
+            if self.debug >= DBG_MIN:
+                self.printc(f"Reg not found: 0x{reg:02X}", DBG_MIN, self.color)
+            return transaction(addr, rw, fack, lack, payload, reg, None, TR_UNKNOWN_REG, self)
 
-                self.page_addr = page_addr
-            else:
-                self.printc(f"No Matching Page Address for: {page_addr}", DBG_NONE, self.color)
-                self.printc(f"Current Page Address: {self.page_addr}", DBG_MIN, self.color)
-                conv = f"No Matching Page Address for: {page_addr}"
+        if self.debug >= DBG_MIN:
+            self.printc(f"{self.name}({self.addr}) {rw}:(0x{reg:02X}) {dec.name} {hex_str(data)} ({dec.format})", DBG_MIN, self.color)
 
-            
+        # No data - Just a command
+        memo = None
+        if len(data) == 0:
+            conv = None
+        elif dec.format == "PAGE": # Change the current page address. Never cached, it changes state
+            conv = self.change_page(dec, data)
+        elif self.memo is not None:
+            memo = self.memo.get(dec, data)
+            conv = memo[0]
+        else:
+            conv = dec.convert(data)
 
-        else :
-            self.printc(f"Type {type} is not implemented", DBG_NONE)
-            conv = data
+        if self.debug >= DBG_MIN:
+            self.printc(f"Output: (0x{reg:02X}) {dec.name} {dec.text(conv)}", DBG_MIN, self.color)
 
-        output = f"({reg}) {reg_name} {conv}{units}"
-        self.printc(f"Output: {output}", DBG_MIN, self.color)
-        
-        result['reg'] = reg
-        result['reg_name'] = reg_name
-        result['result'] = f"{conv}{units}"
-        return result
+        return transaction(addr, rw, fack, lack, payload, reg, conv, TR_OK, self, dec, memo)
     
 
     #print debug messages based on debug level
@@ -332,41 +1019,836 @@ class i2c_device:
             print(f"{color}{dashes} {message} {dashes}{ENDC}")
 
 
+BATCH_FORMATS = ("L11", "L16", "LINEAR") # Register formats the batch collector converts
+class batch_collector:
+    ''' Collects raw 16 bit telemetry words per (addr, page, reg) so they can be converted
+        in one vectorized NumPy pass instead of one Python conversion per transaction '''
+    def __init__(self, with_time: bool = False):
+        self.with_time = with_time # Store a perf_counter timestamp with every word
+        self.regs = {} # (addr, page, reg) -> [decoder, raw words, sequence numbers, timestamps]
+
+    def add(self, addr: int, page: str, reg: int, dec: reg_decoder, data: bytes, seq: int, ts: float = 0.0):
+        bits = dec.format in BIT_FORMATS
+        if bits:
+            if len(data) > 8:
+                return False
+        # L11/L16 use the first word like the scalar decoders. LINEAR needs exactly one word
+        elif len(data) < 2 or (len(data) != 2 and dec.format == "LINEAR"):
+            return False
+
+        entry = self.regs.get((addr, page, reg))
+        if entry is None:
+            entry = [dec, array('Q') if bits else bytearray(), array('Q'), array('d')]
+            self.regs[(addr, page, reg)] = entry
+        if bits:
+            entry[1].append(int.from_bytes(data, 'big'))
+        else:
+            entry[1] += data[:2]
+        entry[2].append(seq)
+        if self.with_time:
+            entry[3].append(ts)
+        return True
+
+    def convert(self) -> Dict[Tuple[int, str, int], Dict[str, Any]]:
+        ''' Convert everything collected so far. Returns a dict per (addr, page, reg) with
+            numpy arrays for values, seq and time (None when timestamps are off) '''
+        if np is None:
+            raise ImportError("numpy is required for batch conversion")
+
+        out = {}
+        for key, (dec, words, seq, ts) in self.regs.items():
+            values = batch_convert(dec, words)
+            out[key] = {
+                'name' : dec.name,
+                'format' : dec.format,
+                'units' : dec.units,
+                'values' : values,
+                'fields' : batch_fields(dec, values),
+                'seq' : np.frombuffer(seq, dtype=np.uint64),
+                'time' : np.frombuffer(ts, dtype=np.float64) if self.with_time else None,
+            }
+        return out
+
+
+def batch_convert(dec: reg_decoder, words: bytes):
+    ''' Vectorized version of the reg_decoder converters for a buffer of raw 2 byte words.
+        Bit field formats are already integers '''
+    if dec.format in BIT_FORMATS:
+        return np.frombuffer(words, dtype=np.uint64)
+    # Index the shared lookup table. PMBus words are sent low byte first, LINEAR uses the register's endian
+    dtype = ('>' if dec.format == "LINEAR" and dec.endian != 'little' else '<') + 'u2'
+    return conv_array(dec)[np.frombuffer(words, dtype=dtype)]
+
+
+def batch_fields(dec: reg_decoder, values) -> Dict[str, Any]:
+    ''' Vectorized reg_decoder.flags() - one array per bit field '''
+    if not dec.fields or dec.format not in BIT_FORMATS:
+        return {}
+    return {name: (values & np.uint64(mask)) >> np.uint64(shift) for name, mask, shift in dec.fields}
+
+
+class capture_recorder:
+    ''' Saves analyzer lines to disk from a background thread. write() only appends to the
+        current batch under a lock. The writer thread takes full batches as soon as they are
+        ready and the partial batch every flush_interval, so lines reach the file even when the
+        capture goes quiet. It keeps one buffered file open and optionally rotates to a new
+        file by size or age '''
+    def __init__(self,
+                 out_dir: str = OUT_DIR,
+                 flush_bytes: int = 64 * 1024,
+                 flush_interval: float = 1.0,
+                 batch_lines: int = 256,
+                 queue_size: int = 1024,
+                 rotate_bytes: Optional[int] = None,
+                 rotate_seconds: Optional[float] = None,
+                 block_when_full: bool = False
+                 ):
+        self.out_dir = out_dir
+        self.flush_bytes = flush_bytes # Flush the file after this many bytes are written
+        self.flush_interval = flush_interval # or after this many seconds
+        self.batch_lines = batch_lines # Lines per batch
+        self.queue_size = queue_size # Full batches waiting for the writer before lines are dropped
+        self.rotate_bytes = rotate_bytes # Start a new file after this many bytes. None = never
+        self.rotate_seconds = rotate_seconds # Start a new file after this many seconds. None = never
+        self.block_when_full = block_when_full # Wait for the writer instead of dropping lines when the queue is full
+        self.dropped = 0 # Lines dropped because the queue was full
+        self.files = [] # Every file written, in order
+        self.path = None # Current output file
+        self.error = None # First OSError from the writer thread
+
+        # Full batches and the batch being filled. Both are only touched while holding ready
+        self.pending = []
+        self.batches = deque()
+        self.ready = threading.Condition()
+        self.closed = False
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.f = None
+        self.open_file()
+        self.thread = threading.Thread(target=self.writer, name="parmesean-recorder", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def open_file(self):
+        # Timestamped like the original one file per start naming. Add a suffix if we rotate within a second
+        name = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.out_dir, name + ".txt")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.out_dir, f"{name}_{n}.txt")
+            n += 1
+
+        if self.f is not None:
+            self.f.close()
+        self.f = open(path, 'wb', buffering=self.flush_bytes)
+        self.path = path
+        self.files.append(path)
+        self.opened = time.monotonic()
+        self.written = 0
+
+    # Rotation is checked before each write so a rotation never leaves an empty file behind
+    def rotate_due(self) -> bool:
+        if self.written == 0:
+            return False
+        if self.rotate_bytes is not None and self.written >= self.rotate_bytes:
+            return True
+        return self.rotate_seconds is not None and time.monotonic() - self.opened >= self.rotate_seconds
+
+    def write(self, line):
+        ''' Queue one analyzer line (str or bytes). Never blocks unless block_when_full is set '''
+        with self.ready:
+            self.pending.append(line)
+            if len(self.pending) >= self.batch_lines:
+                self.send()
+
+    def send(self):
+        # Move the current batch to the full batches. Called with ready held
+        if not self.pending:
+            return
+        if len(self.batches) >= self.queue_size:
+            if not self.block_when_full:
+                self.dropped += len(self.pending)
+                self.pending = []
+                return
+            self.ready.wait_for(lambda: len(self.batches) < self.queue_size or self.closed)
+        self.batches.append(self.pending)
+        self.pending = []
+        self.ready.notify_all()
+
+    def take(self, timeout: float):
+        ''' (lines to write, shutting down) for the writer thread. Waits up to timeout for a full
+            batch, then also takes the partial batch so the time based flush doesn't depend on write() '''
+        with self.ready:
+            if not self.batches and not self.closed:
+                self.ready.wait(timeout)
+            lines = []
+            while self.batches:
+                lines.extend(self.batches.popleft())
+            if self.closed or not lines:
+                lines.extend(self.pending)
+                self.pending = []
+            self.ready.notify_all() # Room for writers blocked on a full queue
+            return lines, self.closed
+
+    def writer(self):
+        last_flush = time.monotonic()
+        unflushed = 0
+        done = False
+        while not done:
+            batch, done = self.take(self.flush_interval)
+            try:
+                for line in batch:
+                    if self.rotate_due():
+                        self.open_file()
+                        unflushed = 0
+                    if isinstance(line, str):
+                        line = line.encode('utf-8')
+                    line = bytes(line).rstrip(b"\r\n") + b"\n"
+                    self.f.write(line)
+                    self.written += len(line)
+                    unflushed += len(line)
+
+                now = time.monotonic()
+                if unflushed and (unflushed >= self.flush_bytes or now - last_flush >= self.flush_interval):
+                    self.f.flush()
+                    last_flush = now
+                    unflushed = 0
+            except OSError as e:
+                if self.error is None:
+                    self.error = e
+                    print(f"Error writing capture: {e}")
+
+        self.f.close()
+
+    def flush(self):
+        ''' Hand the partial batch to the writer now '''
+        with self.ready:
+            self.send()
+
+    def close(self):
+        ''' Write everything still queued and close the file. Safe to call more than once '''
+        with self.ready:
+            if self.closed:
+                return
+            self.closed = True
+            self.ready.notify_all()
+        self.thread.join()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+SINK_BATCH = 512 # Transactions rendered per write to the output stream
+SEPARATOR = "----------------------------------------------------"
+
+
+class output_sink:
+    ''' Where decoded transactions go. Subclasses only render the fields they write and
+        buffer their output, writing once per batch instead of once per transaction '''
+    def __init__(self, out = None, mode: str = 'w', batch: int = SINK_BATCH):
+        # out is a path or an open file. Files we open are closed by close()
+        self.owns = isinstance(out, (str, os.PathLike))
+        if self.owns:
+            self.f = open(out, mode, newline='' if 'b' not in mode else None)
+        else:
+            self.f = out
+        self.batch = batch
+        self.pending = []
+        self.count = 0 # Transactions written
+
+    def render(self, tr: transaction):
+        raise NotImplementedError
+
+    def write(self, tr: transaction):
+        self.pending.append(self.render(tr))
+        self.count += 1
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def write_line(self, line, transactions):
+        ''' All transactions decoded from one analyzer line. line is None for binary and CSV captures '''
+        for tr in transactions:
+            self.write(tr)
+
+    def write_repeats(self, report: List[Dict[str, Any]]):
+        ''' Suppressed repeat counts from delta_filter.take_repeats(). Ignored by default '''
+        pass
+
+    def flush(self):
+        if self.pending:
+            self.f.write(self.join(self.pending))
+            self.pending = []
+        self.f.flush()
+
+    def join(self, pending):
+        return "".join(pending)
+
+    def close(self):
+        if self.f is None:
+            return
+        self.flush()
+        if self.owns:
+            self.f.close()
+        self.f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class terminal_sink(output_sink):
+    ''' Same text as printc_result. show_lines adds the separator, any ignored addresses and the
+        analyzer line (spaces removed) before each line's transactions like the __main__ loop always
+        has. color=False drops the ANSI codes '''
+    def __init__(self, out = None, show_lines: bool = True, color: bool = True, batch: int = SINK_BATCH):
+        super().__init__(sys.stdout if out is None else out, 'w', batch)
+        self.show_lines = show_lines
+        self.color = color
+
+    def render(self, tr: transaction):
+        text = f"{tr['name']}({tr['addr']}) {tr['rw']} ({tr['fack']}) {tr['reg_name']}({tr['reg']}) {tr['result']} ({tr['raw']})"
+        return f"{tr['color']}{text}{ENDC}\n" if self.color else text + "\n"
+
+    def write_line(self, line, transactions):
+        if self.show_lines and line is not None:
+            if isinstance(line, (bytes, bytearray)):
+                line = line.decode('latin-1')
+            self.pending.append(SEPARATOR + "\n")
+            for tr in transactions:
+                if tr.status == TR_IGNORED:
+                    text = f"Transaction Ignored: 0x{tr.addr:02X}"
+                    self.pending.append(f"{WHITE}{text}{ENDC}\n" if self.color else text + "\n")
+            self.pending.append(line.strip().replace(" ", "") + "\n")
+        super().write_line(line, transactions)
+
+    def write_repeats(self, report):
+        for r in report:
+            self.pending.append(f"{r['addr']} page {r['page']} {r['reg_name']}({r['reg']}) unchanged x{r['repeats']}\n")
+
+
+SINK_FIELDS = tuple(key for key in RESULT_KEYS if key != 'color') # Default fields for file sinks
+
+
+class jsonl_sink(output_sink):
+    ''' One JSON object per transaction with only the requested fields '''
+    def __init__(self, out, fields = SINK_FIELDS, batch: int = SINK_BATCH):
+        super().__init__(out, 'w', batch)
+        self.fields = tuple(fields)
+
+    def render(self, tr: transaction):
+        return json.dumps({key: tr.text(key) for key in self.fields}) + "\n"
+
+    def write_repeats(self, report):
+        self.pending.extend(json.dumps({'repeats' : r}) + "\n" for r in report)
+
+
+class csv_sink(output_sink):
+    ''' CSV with a header row and only the requested fields '''
+    def __init__(self, out, fields = SINK_FIELDS, batch: int = SINK_BATCH):
+        super().__init__(out, 'w', batch)
+        self.fields = tuple(fields)
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(self.fields)
+
+    def render(self, tr: transaction):
+        return [tr.text(key) for key in self.fields]
+
+    def flush(self):
+        if self.pending:
+            self.writer.writerows(self.pending)
+            self.pending = []
+        self.f.flush()
+
+
+# Decoded binary records. Nothing is rendered to text. File starts with RECORD_FILE_HEADER
+# using DECODED_MAGIC, then DECODED_HEADER + payload per transaction
+DECODED_MAGIC = b"PRMD"
+DECODED_HEADER = struct.Struct("<BBHBBd") # addr, flags, payload length, reg, status, value (NaN if not numeric)
+
+
+class binary_sink(output_sink):
+    def __init__(self, out, batch: int = SINK_BATCH):
+        super().__init__(out, 'wb', batch)
+        self.f.write(RECORD_FILE_HEADER.pack(DECODED_MAGIC, RECORD_VERSION))
+
+    def render(self, tr: transaction):
+        flags = (REC_WRITE if tr.rw == 'W' else 0) | (REC_FACK if tr.fack else 0)
+        if tr.lack is not None:
+            flags |= REC_HAS_LACK | (REC_LACK if tr.lack else 0)
+        value = tr.value if isinstance(tr.value, (int, float)) and tr.status == TR_OK else float('nan')
+        reg = 0 if tr.reg is None else tr.reg
+        return DECODED_HEADER.pack(tr.addr, flags, len(tr.payload), reg, tr.status, value) + bytes(tr.payload)
+
+    def join(self, pending):
+        return b"".join(pending)
+
+
+def read_decoded(path: str):
+    ''' Read back a binary_sink file. Yields (addr, rw, fack, lack, reg, status, value, payload) '''
+    with open(path, 'rb') as f:
+        buf = f.read()
+    magic, version = RECORD_FILE_HEADER.unpack_from(buf, 0)
+    if magic != DECODED_MAGIC or version != RECORD_VERSION:
+        raise ValueError(f"Not a version {RECORD_VERSION} decoded record file")
+    pos = RECORD_FILE_HEADER.size
+    while pos < len(buf):
+        addr, flags, length, reg, status, value = DECODED_HEADER.unpack_from(buf, pos)
+        pos += DECODED_HEADER.size
+        lack = bool(flags & REC_LACK) if flags & REC_HAS_LACK else None
+        yield (addr, 'W' if flags & REC_WRITE else 'R', bool(flags & REC_FACK), lack,
+               None if status in (TR_NO_DATA, TR_IGNORED) else reg, status, value, buf[pos:pos + length])
+        pos += length
+
+
+SINK_TYPES = {".jsonl": jsonl_sink, ".json": jsonl_sink, ".csv": csv_sink, ".prmd": binary_sink, ".bin": binary_sink}
+
+def open_sink(path: Optional[str] = None) -> output_sink:
+    ''' Sink for an output path, picked by extension. None or - is the terminal '''
+    if path is None or path == "-":
+        return terminal_sink()
+    sink = SINK_TYPES.get(os.path.splitext(path)[1].lower())
+    if sink is None:
+        raise ValueError(f"No output sink for {path}. Use one of {', '.join(SINK_TYPES)}")
+    return sink(path)
+
+
+LATENCY_BUCKETS = 64 # Log2 nanosecond buckets. Bucket n holds [2^(n-1), 2^n) ns
+
+
+class parse_stats:
+    ''' Counters and timings collected by Parmesean when stats are enabled '''
+    def __init__(self):
+        self.started = time.time()
+        self.lines = 0
+        self.frames = 0
+        self.nacks = 0 # Address NACKs
+        self.unknown_regs = 0
+        self.no_data = 0
+        self.ignored = 0
+        self.tokenize_ns = 0
+        self.decode_ns = 0
+        self.render_ns = 0
+        self.per_addr = {} # addr -> [frames, nacks, unknown regs]
+        self.per_reg = {} # (addr, reg) -> frames
+        self.latency = {} # format -> decode latency histogram
+
+    def add_line(self, ns: int):
+        self.lines += 1
+        self.tokenize_ns += ns
+
+    def add(self, tr: transaction, ns: int):
+        self.frames += 1
+        self.decode_ns += ns
+
+        counts = self.per_addr.get(tr.addr)
+        if counts is None:
+            counts = self.per_addr[tr.addr] = [0, 0, 0]
+        counts[0] += 1
+        if not tr.fack:
+            self.nacks += 1
+            counts[1] += 1
+
+        status = tr.status
+        if status == TR_UNKNOWN_REG:
+            self.unknown_regs += 1
+            counts[2] += 1
+        elif status == TR_NO_DATA:
+            self.no_data += 1
+        elif status == TR_IGNORED:
+            self.ignored += 1
+
+        if tr.reg is not None:
+            key = (tr.addr, tr.reg)
+            self.per_reg[key] = self.per_reg.get(key, 0) + 1
+
+        fmt = tr.dec.format if tr.dec is not None and tr.dec.format else "NONE"
+        hist = self.latency.get(fmt)
+        if hist is None:
+            hist = self.latency[fmt] = [0] * LATENCY_BUCKETS
+        hist[min(ns.bit_length(), LATENCY_BUCKETS - 1)] += 1
+
+    def percentile(self, fmt: str, pct: float) -> float:
+        ''' Approximate decode latency in ns for a format. Interpolates inside the log2 bucket '''
+        hist = self.latency.get(fmt)
+        if not hist:
+            return 0.0
+        target = sum(hist) * pct / 100
+        seen = 0
+        for n, count in enumerate(hist):
+            if count and seen + count >= target:
+                low = 0 if n == 0 else 1 << (n - 1)
+                return low + (low or 1) * (target - seen) / count
+            seen += count
+        return float(1 << (LATENCY_BUCKETS - 1))
+
+    def snapshot(self, devices: Dict[int, "i2c_device"] = None) -> Dict[str, Any]:
+        devices = devices or {}
+        per_addr = {}
+        for addr, (frames, nacks, unknown) in self.per_addr.items():
+            dev = devices.get(addr)
+            per_addr[f"0x{addr:02X}"] = {
+                'name' : dev.name if dev is not None else "",
+                'frames' : frames,
+                'nacks' : nacks,
+                'unknown_regs' : unknown,
+            }
+
+        return {
+            'elapsed' : time.time() - self.started,
+            'lines' : self.lines,
+            'frames' : self.frames,
+            'nacks' : self.nacks,
+            'unknown_regs' : self.unknown_regs,
+            'no_data' : self.no_data,
+            'ignored' : self.ignored,
+            'tokenize_ns' : self.tokenize_ns,
+            'decode_ns' : self.decode_ns,
+            'render_ns' : self.render_ns,
+            'devices' : per_addr,
+            'registers' : {f"0x{addr:02X}:0x{reg:02X}": n for (addr, reg), n in self.per_reg.items()},
+            'latency' : {fmt: {'count' : sum(hist),
+                               'p50' : self.percentile(fmt, 50),
+                               'p90' : self.percentile(fmt, 90),
+                               'p99' : self.percentile(fmt, 99)} for fmt, hist in self.latency.items()},
+        }
+
+
+class running_stats:
+    ''' O(1) memory min/max/mean/stddev (Welford) '''
+    __slots__ = ("count", "mean", "m2", "min", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.last = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.last = value
+
+    @property
+    def stddev(self) -> float:
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def merge(self, other: "running_stats"):
+        ''' Combine with stats collected separately (Chan et al.) '''
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'count' : self.count, 'min' : self.min, 'max' : self.max, 'mean' : self.mean,
+                'stddev' : self.stddev, 'last' : self.last}
+
+
+class telemetry_stats:
+    ''' Streaming statistics per (addr, page, reg) for the numeric formats. Each register keeps
+        totals plus the last keep_buckets windows of bucket_seconds each.
+
+        thresholds maps a register name ("READ_VOUT_0") or (addr, reg) to (low, high). Either
+        limit can be None. Leaving the range counts one excursion and calls
+        alert(transaction, value, (low, high)) if given '''
+    def __init__(self, bucket_seconds: float = 1.0, keep_buckets: int = 60,
+                 thresholds: Dict[Any, Tuple[Optional[float], Optional[float]]] = None,
+                 alert = None, clock = time.time):
+        self.bucket_seconds = bucket_seconds
+        self.keep_buckets = keep_buckets
+        self.thresholds = thresholds or {}
+        self.alert = alert
+        self.clock = clock # Timestamp source for the windows
+        self.regs = {} # (addr, page, reg) -> [decoder, totals, deque of (bucket start, running_stats), limits, excursions, outside]
+
+    def add(self, tr: transaction):
+        dec = tr.dec
+        if tr.status != TR_OK or tr.value is None or dec.format not in BATCH_FORMATS:
+            return
+        key = (tr.addr, dec.page, tr.reg)
+        entry = self.regs.get(key)
+        if entry is None:
+            limits = self.thresholds.get(dec.name, self.thresholds.get((tr.addr, tr.reg)))
+            entry = self.regs[key] = [dec, running_stats(), deque(maxlen=self.keep_buckets), limits, 0, False]
+
+        value = tr.value
+        entry[1].add(value)
+
+        start = self.clock() // self.bucket_seconds * self.bucket_seconds
+        buckets = entry[2]
+        if not buckets or buckets[-1][0] != start:
+            buckets.append((start, running_stats()))
+        buckets[-1][1].add(value)
+
+        limits = entry[3]
+        if limits is not None:
+            low, high = limits
+            outside = (low is not None and value < low) or (high is not None and value > high)
+            if outside and not entry[5]:
+                entry[4] += 1
+                if self.alert is not None:
+                    self.alert(tr, value, limits)
+            entry[5] = outside
+
+    def get(self, addr: int, reg: int, page: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ''' Stats for one register. page can be left out for devices with one page '''
+        if page is None:
+            for key in self.regs:
+                if key[0] == addr and key[2] == reg:
+                    return self.describe(key)
+            return None
+        return self.describe((addr, page, reg)) if (addr, page, reg) in self.regs else None
+
+    def describe(self, key: Tuple[int, str, int]) -> Dict[str, Any]:
+        dec, totals, buckets, limits, excursions, outside = self.regs[key]
+        out = totals.as_dict()
+        out.update({
+            'addr' : f"0x{key[0]:02X}",
+            'page' : key[1],
+            'reg' : f"0x{key[2]:02X}",
+            'name' : dec.name,
+            'units' : dec.units,
+            'limits' : limits,
+            'excursions' : excursions,
+            'outside' : outside,
+            'windows' : [dict(start=start, **stats.as_dict()) for start, stats in buckets],
+        })
+        return out
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {f"0x{addr:02X}:{page}:0x{reg:02X}": self.describe((addr, page, reg)) for addr, page, reg in self.regs}
+
+
+class delta_filter:
+    ''' Change-only output. Remembers the last emitted value per (addr, page, reg) and drops
+        transactions that repeat it. Numeric values only count as changed when they move more
+        than the register's deadband ("deadband" in the device JSON, or deadbands which maps a
+        register name or (addr, reg) to a deadband like telemetry_stats thresholds).
+        Dropped repeats are counted until take_repeats() is called, due() says when
+        interval seconds have passed since the last report '''
+    def __init__(self, interval: float = 10.0, deadbands: Dict[Any, float] = None, clock = time.monotonic):
+        self.interval = interval
+        self.deadbands = deadbands or {}
+        self.clock = clock
+        self.last = {} # (addr, page, reg) -> [value, deadband, repeats since last report, decoder]
+        self.suppressed = 0 # Total repeats dropped
+        self.emitted = 0
+        self.last_report = clock()
+
+    def keep(self, tr: transaction) -> bool:
+        status = tr.status
+        if status == TR_OK:
+            dec = tr.dec
+            if tr.value is None or dec.format == "PAGE": # Commands and page changes always go out
+                return True
+            key = (tr.addr, dec.page, tr.reg)
+            value = tr.value
+        elif status == TR_UNKNOWN_REG:
+            dec = None
+            key = (tr.addr, tr.dev.page_addr, tr.reg)
+            value = tr.data
+        else:
+            return True
+
+        entry = self.last.get(key)
+        if entry is None:
+            deadband = 0.0 if dec is None else self.deadbands.get(dec.name, self.deadbands.get((tr.addr, tr.reg), dec.deadband))
+            self.last[key] = [value, deadband, 0, dec]
+            self.emitted += 1
+            return True
+
+        last = entry[0]
+        if entry[1] and isinstance(value, (int, float)) and isinstance(last, (int, float)):
+            changed = abs(value - last) > entry[1]
+        else:
+            changed = value != last
+        if changed:
+            entry[0] = value
+            self.emitted += 1
+            return True
+        entry[2] += 1
+        self.suppressed += 1
+        return False
+
+    def filter(self, transactions):
+        return [tr for tr in transactions if self.keep(tr)]
+
+    def due(self) -> bool:
+        return self.clock() - self.last_report >= self.interval
+
+    def take_repeats(self) -> List[Dict[str, Any]]:
+        ''' Registers with dropped repeats since the last call, then reset their counts '''
+        self.last_report = self.clock()
+        report = []
+        for (addr, page, reg), entry in self.last.items():
+            if entry[2]:
+                report.append({'addr' : f"0x{addr:02X}", 'page' : page, 'reg' : f"0x{reg:02X}",
+                               'reg_name' : entry[3].name if entry[3] is not None else "", 'repeats' : entry[2]})
+                entry[2] = 0
+        return report
+
+
+INDEX_VERSION = 1
+INDEX_CHECKPOINT_LINES = 4096 # Lines between device state checkpoints
+INDEX_TAIL_BYTES = 4096 # Bytes before the indexed end used to check the capture wasn't replaced
+
+
+class capture_index:
+    ''' Sidecar index for a capture file (<capture>.pidx). Maps (addr, page, reg) to the line
+        numbers and byte offsets of the lines with frames to that register (reg None for frames
+        without data), and keeps a device
+        state checkpoint every checkpoint_lines lines so a query can start decoding anywhere '''
+    def __init__(self, capture: str, path: Optional[str] = None, checkpoint_lines: int = INDEX_CHECKPOINT_LINES):
+        self.capture = capture
+        self.path = path or capture + ".pidx"
+        self.checkpoint_lines = checkpoint_lines
+        self.size = 0 # Bytes of the capture indexed so far (always ends on a line boundary)
+        self.lines = 0 # Lines indexed so far
+        self.tail = b"" # Hash of the bytes just before size
+        self.postings = {} # (addr, page, reg or None) -> [array of line numbers, array of byte offsets]
+        self.checkpoints = [] # (line, offset, device state) sorted by line
+        self.state = {} # Device state at the end of the indexed lines
+
+    def add(self, key: Tuple[int, str, int], line_no: int, offset: int):
+        posting = self.postings.get(key)
+        if posting is None:
+            posting = self.postings[key] = [array('Q'), array('Q')]
+        posting[0].append(line_no)
+        posting[1].append(offset)
+
+    def lookup(self, addr: int, page: Optional[str] = None, reg: Optional[int] = None,
+               start_line: int = 0, end_line: Optional[int] = None) -> List[Tuple[int, int]]:
+        ''' Sorted (line, offset) of every indexed line matching the query '''
+        end_line = self.lines if end_line is None else end_line
+        found = {}
+        for (k_addr, k_page, k_reg), (lines, offsets) in self.postings.items():
+            if k_addr != addr or (page is not None and k_page != page) or (reg is not None and k_reg != reg):
+                continue
+            lo = bisect.bisect_left(lines, start_line)
+            hi = bisect.bisect_left(lines, end_line)
+            for i in range(lo, hi):
+                found[lines[i]] = offsets[i]
+        return sorted(found.items())
+
+    def tail_hash(self) -> bytes:
+        with open(self.capture, 'rb') as f:
+            f.seek(max(0, self.size - INDEX_TAIL_BYTES))
+            return hashlib.sha1(f.read(self.size - f.tell())).digest()
+
+    def matches_capture(self) -> bool:
+        ''' True if the indexed part of the capture is unchanged, so the index can be extended '''
+        try:
+            return os.path.getsize(self.capture) >= self.size and self.tail_hash() == self.tail
+        except OSError:
+            return False
+
+    def up_to_date(self) -> bool:
+        ''' True if the index covers every complete line of the capture '''
+        if not self.matches_capture():
+            return False
+        size = os.path.getsize(self.capture)
+        if size == self.size:
+            return True
+        # Only a partial last line left?
+        with open(self.capture, 'rb') as f:
+            f.seek(self.size)
+            return b"\n" not in f.read(size - self.size)
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return False
+        for key in ('checkpoint_lines', 'size', 'lines', 'tail', 'postings', 'checkpoints', 'state'):
+            setattr(self, key, data[key])
+        return True
+
+    def save(self):
+        self.tail = self.tail_hash()
+        data = {key: getattr(self, key) for key in ('checkpoint_lines', 'size', 'lines', 'tail', 'postings', 'checkpoints', 'state')}
+        data['version'] = INDEX_VERSION
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+
 class Parmesean():
     def __init__(self, 
                  settings_file: str = SETTINGS_FILE,
                  devices_dir: str = DEVICES_DIR,
                  out_dir: str = OUT_DIR,
-                 save_data: bool = False
+                 save_data: bool = False,
+                 recorder: capture_recorder = None,
+                 cache_dir: Optional[str] = CACHE_DIR,
+                 verbose: bool = False
                  ):
         self.devices = {}
+        self.configured = set() # Addresses from settings.json. devices also gets unknown addresses as they're seen
         self.ignore_list = []
+        self.ignore_addrs = set() # Integer addresses from ignore_list
         self.debug = False
+        self.color = COLOR["WHITE"]
         self.out_dir = out_dir # Folder to put saved output text files
         self.devices_dir = devices_dir # Folder with JSON device files
         self.settings_file = settings_file # Path to specific json settings file
-        self.save_data = save_data
+        self.cache_dir = cache_dir # Compiled device definition cache. None to always read the JSON
+        self.save_data = save_data or recorder is not None
+        self.verbose = verbose # Print the settings and device list while loading. Errors are always printed
+        self.stats = None # parse_stats when enabled with enable_stats()
+        self.telemetry = None # telemetry_stats when enabled with enable_telemetry()
+        self.memo = None # decode_cache when enabled with enable_memo()
+        self.delta = None # delta_filter when enabled with enable_delta()
+        self.filter = None # frame_filter set with set_filter()
+        self.trace_hook = None
+        self.profiler = None
+        self.recorder = recorder # Background writer for saved lines. Created below when save_data is set
+        self.out_file = None
         # TODO: Eventually make this a Saleae setting to change the prefix/suffix
-        now = datetime.now()
-        timestampe_str = now.strftime("%Y%m%d_%H%M%S")
-        self.out_file = os.path.join(self.out_dir, (timestampe_str + ".txt"))
 
-        print("\033c")
-        print("\x1b[H\x1b[2J\033[0m")
-        print("----------Welcome to Parmesean----------")
         self.load_settings()
        
         # Only save data if we want to. 
         if self.save_data:
             try:
-                open(self.out_file, 'w').close()
-                print(f"File '{self.out_file}' created successfully and is blank.")
+                if self.recorder is None:
+                    self.recorder = capture_recorder(self.out_dir)
+                self.out_file = self.recorder.path
+                self.log(f"File '{self.out_file}' created successfully and is blank.")
             except OSError as e:
                 print(f"Error creating file: {e}")
+                self.save_data = False
         
     
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
     def load_settings(self):
-        print(f"Loading Settings: {self.settings_file}")
+        self.log(f"Loading Settings: {self.settings_file}")
         try:
             with open(self.settings_file, 'r', encoding='utf-8') as f:
                 settings = json.load(f)
@@ -390,23 +1872,24 @@ class Parmesean():
                         debug = DBG_MAX
 
                     
-                    print(f"Debug: {debug}")
+                    self.log(f"Debug: {debug}")
 
             #Save Settings
             elif s["name"] == "Save New Devices":
                     save_devices = s["value"]
-                    print(f"Save Devices: {save_devices}")
+                    self.log(f"Save Devices: {save_devices}")
                         
 
             elif s["name"]  == "Ignore Devices":
                     ilist = s["value"]
                     ilist = ilist.replace(" ", "")
                     self.ignore_list = ilist.split(",")                       
+                    self.ignore_addrs = set(int(a, 16) for a in self.ignore_list if a != "")
 
-                    print(f"Ignore List: {self.ignore_list}")
+                    self.log(f"Ignore List: {self.ignore_list}")
             elif s["name"] == "Save Output":
                 save_output = s["value"]
-                print(f"Save Output: {save_output}")
+                self.log(f"Save Output: {save_output}")
 
 
         for d in settings["devices"]:
@@ -424,143 +1907,816 @@ class Parmesean():
                             cmd_length=d['cmd_length'],
                             json_path=json_path,
                             debug=d['debug'],
-                            color=d["color"])
+                            color=d["color"],
+                            cache_dir=self.cache_dir)
             # Insert new device at the associated address and check if it was created correctly
             if dev.addr is not None:
-                self.devices[dev.addr] = dev
+                self.devices[int(dev.addr, 16)] = dev
+                self.configured.add(int(dev.addr, 16))
 
+        if not self.verbose:
+            return
         print("Starting Parmesean with the following devices:")
 
         for dev in self.devices.values():
-            if dev.addr in self.ignore_list:
+            if int(dev.addr, 16) in self.ignore_addrs:
                 dev.printc(f"{dev.name} @ {dev.addr} (IGNORED)", DBG_NONE)
             else:
                 dev.printc(f"{dev.name} @ {dev.addr} : {dev.desc}", DBG_NONE)
         print("----------------------------------------------------")
 
 
-    def parse(self, data: str):
-        if self.save_data:
-            with open(self.out_file, "a") as f:
-                    f.write(f"{data}\n")
-
-        data = line.strip()
-        data = data.replace(" ", "")
-        rw = "ERROR"
-        addr = "ERROR"
-        ack = 'ERROR'
-        result = {
-            'addr' : "",
-            'name' : "",
-            'reg' : "",
-            'reg_name' : "",
-            'data' : "",
-            'rw' : "",
-            "fack" : "",
-            "lack" : "",
-            "color" : "",
-            "result" : "",
-            "raw" : "",
-            "orig" : data
-        }
+    def parse(self, data):
+        ''' Decode one analyzer line (str or bytes). Returns a list of transactions, one per frame, or None '''
+        if self.recorder is not None:
+            self.recorder.write(data)
 
-        result_list = []
-        for tr in tr_pattern.finditer(data):
-
-            # Look for the first address message to store the RW token
-            # addr_match = addr_pattern.search(data)
-            # tr_match = tr_pattern.search(data)
-            addr = tr.group("addr")
-            rw = tr.group("rw")
-            fack = 'ACK' if tr.group("fack") == '+' else 'NACK'
-            data_list = data_pattern.findall(tr.group(0))
-            lack = tr.group('lack')
-            # Format all the valid data together 
-            # Otherwise make the parsing string blank
-            if data_list is not None:
-                data_str = '0x' + "".join(data_list)
-            else:
-                data_str = ""
-
-            if addr is None:
-                self.printc(f"NO ADDRESS FOUND IN {data}", DBG_NONE)
-                result['addr'] = "ERROR"
-                result['rw'] = "ERROR"
-                result['fack'] = "ERROR"
-                result['lack'] = "ERROR"
-                result_list.append(tr)
-                pass
-            
-            # Check if address should be ignored
-            if addr in self.ignore_list:
-                self.printc(f"Transaction Ignored: {addr}", DBG_NONE)
-                result['addr'] = addr
-                result['rw'] = rw
-                result['fack'] = fack
-                result['lack'] = lack
-                result['data'] = data
-                result['addr'] = f"{addr}"
-                result['result'] = f"(IGNORED)"
-                result_list.append(result)
-                # Do nothing with the data
-                pass
-
-            # Check for address in device list
-            elif addr not in self.devices:
-                self.printc(f"Creating new device for {addr}", DBG_MIN, GREEN)
-                dev = i2c_device(addr=addr, cmd_length=0,desc="", name="", json_path="", debug=self.debug, color=RED)   
-                
-                if dev is not None:
-                    self.devices[addr] = dev
-                
-            # Check if address was added before using it
-            if addr in self.devices:
-                # print('Data: ', data)
-                result = self.devices[addr].parse(rw, data_str, fack, lack)
-                result['orig'] = data
-                # self.devices[addr].printc(f"{result['name']}({result['addr']}) {result['rw']} {result['reg_name']}({result['reg']}) {result['result']} ({result['data']})", DBG_MIN, result['color'])
-                result_list.append(result)
+        if self.stats is not None:
+            return self.parse_timed(data)
+
+        if self.filter is None:
+            result_list = [self.parse_frame(*frame) for frame in tokenize(data)]
+        else:
+            result_list = [tr for tr in (self.filter_frame(*frame) for frame in tokenize(data, self.filter)) if tr is not None]
+        if self.delta is not None:
+            result_list = self.delta.filter(result_list)
 
         # Set result to None if no data is found
         if len(result_list) == 0:
             result_list = None
         return result_list
 
+    def parse_timed(self, data):
+        ''' parse() with stats enabled. Times the tokenizer and every frame decode '''
+        stats = self.stats
+        start = time.perf_counter_ns()
+        frames = tokenize(data, self.filter)
+        end = time.perf_counter_ns()
+        stats.add_line(end - start)
+
+        parse_frame = self.parse_frame if self.filter is None else self.filter_frame
+        result_list = []
+        for frame in frames:
+            start = end
+            tr = parse_frame(*frame)
+            end = time.perf_counter_ns()
+            if tr is None:
+                continue
+            stats.add(tr, end - start)
+            if self.trace_hook is not None:
+                self.trace_hook("decode", tr, end - start)
+            result_list.append(tr)
+
+        if self.delta is not None:
+            result_list = self.delta.filter(result_list)
+        return result_list if result_list else None
+
+    def parse_frame(self, addr: int, rw: str, fack: bool, lack: Optional[bool], payload: bytearray) -> transaction:
+        payload = bytes(payload)
+
+        # Check if address should be ignored
+        if addr in self.ignore_addrs:
+            # terminal_sink shows this with the line it came from
+            self.printc(f"Transaction Ignored: 0x{addr:02X}", DBG_MIN)
+            # Do nothing with the data
+            return transaction(addr, rw, fack, lack, payload, status=TR_IGNORED)
+
+        tr = self.device(addr).parse(addr, rw, payload, fack, lack)
+        if self.telemetry is not None:
+            self.telemetry.add(tr)
+        return tr
+
+    def filter_frame(self, addr: int, rw: str, fack: bool, lack: Optional[bool], payload: bytearray) -> Optional[transaction]:
+        ''' parse_frame() through the current filter. None when the frame is filtered out '''
+        flt = self.filter
+        if not flt.accept_addr(addr, fack):
+            return None
+        if flt.post and addr not in self.ignore_addrs and not flt.accept(self.device(addr), rw, payload, lack):
+            return None
+        return self.parse_frame(addr, rw, fack, lack, payload)
+
+    def set_filter(self, flt = None) -> Optional[frame_filter]:
+        ''' Only decode the frames flt accepts. flt is a frame_filter, a compile_filter() string
+            or None to decode everything. Used by parse(), parse_file(), decode_to() and live decoding.
+            parse_parallel() and query_index() always decode every frame '''
+        if isinstance(flt, str):
+            flt = compile_filter(flt)
+        if flt is not None:
+            flt.compile(self.configured)
+        self.filter = flt
+        return flt
+
+    def device(self, addr: int) -> i2c_device:
+        ''' Device at addr. Unknown addresses get a new device without a parser '''
+        dev = self.devices.get(addr)
+        # Check for address in device list
+        if dev is None:
+            self.printc(f"Creating new device for 0x{addr:02X}", DBG_MIN, GREEN)
+            dev = i2c_device(addr=f"0x{addr:02X}", cmd_length=0,desc="", name="", json_path="", debug=self.debug, color=RED)   
+            dev.memo = self.memo
+            self.devices[addr] = dev
+        elif not dev.loaded:
+            dev.load()
+        return dev
+
+    def enable_stats(self, trace_hook = None) -> parse_stats:
+        ''' Start counting transactions and timing each stage. trace_hook(stage, transaction, ns)
+            is called after every decode and render if given '''
+        self.stats = parse_stats()
+        self.trace_hook = trace_hook
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+        self.trace_hook = None
+
+    def stats_snapshot(self) -> Optional[Dict[str, Any]]:
+        ''' Copy of the current counters and timings, or None if stats are off '''
+        return None if self.stats is None else self.stats.snapshot(self.devices)
+
+    def enable_telemetry(self, bucket_seconds: float = 1.0, keep_buckets: int = 60,
+                         thresholds: Dict[Any, Tuple[Optional[float], Optional[float]]] = None,
+                         alert = None, clock = time.time) -> "telemetry_stats":
+        ''' Keep running min/max/mean/stddev of every L11/L16/LINEAR register as it is decoded.
+            See telemetry_stats for the threshold and alert arguments '''
+        self.telemetry = telemetry_stats(bucket_seconds, keep_buckets, thresholds, alert, clock)
+        return self.telemetry
+
+    def disable_telemetry(self):
+        self.telemetry = None
+
+    def telemetry_snapshot(self) -> Optional[Dict[str, Any]]:
+        return None if self.telemetry is None else self.telemetry.snapshot()
+
+    def enable_memo(self, size: int = MEMO_SIZE) -> decode_cache:
+        ''' Cache the last size decoded values. Repeated polls of the same register and payload
+            skip the conversion and reuse the rendered text '''
+        self.memo = decode_cache(size)
+        for dev in self.devices.values():
+            dev.memo = self.memo
+        return self.memo
+
+    def disable_memo(self):
+        self.memo = None
+        for dev in self.devices.values():
+            dev.memo = None
+
+    def memo_snapshot(self) -> Optional[Dict[str, Any]]:
+        return None if self.memo is None else self.memo.snapshot()
+
+    def enable_delta(self, interval: float = 10.0, deadbands: Dict[Any, float] = None,
+                     clock = time.monotonic) -> delta_filter:
+        ''' Only output transactions whose value changed. decode_to() writes the suppressed
+            repeat counts to the sink every interval seconds. See delta_filter '''
+        self.delta = delta_filter(interval, deadbands, clock)
+        return self.delta
+
+    def disable_delta(self):
+        self.delta = None
+
+    def start_profile(self):
+        ''' Run cProfile until stop_profile() is called '''
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, sort: str = "cumulative") -> pstats.Stats:
+        self.profiler.disable()
+        stats = pstats.Stats(self.profiler).sort_stats(sort)
+        self.profiler = None
+        return stats
+
+    def decode_chunk(self, path: str, start: int, end: int):
+        ''' Decode the lines in [start, end) of a file for parse_parallel(). Starts from unknown device state.
+            Returns (rows, state). Each row is (addr, rw, fack, lack, payload, reg, value, status, page, pending).
+            pending rows used page or last_reg before this chunk set them and have to be decoded again once the
+            previous chunk's final state is known. state is {addr: (page, last_reg, page_known, reg_known)} '''
+        rows = []
+        known = {} # addr -> [page_known, reg_known]
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.seek(start)
+            while mm.tell() < end:
+                for addr, rw, fack, lack, payload in tokenize(mm.readline()):
+                    payload = bytes(payload)
+                    if addr in self.ignore_addrs:
+                        rows.append((addr, rw, fack, lack, payload, None, None, TR_IGNORED, None, False))
+                        continue
+
+                    dev = self.device(addr)
+                    k = known.get(addr)
+                    if k is None:
+                        if not dev.loaded:
+                            dev.load()
+                        # With one page (or none) the page can never be wrong
+                        k = known[addr] = [dev.definition is None or len(dev.pages) <= 1, False]
+
+                    pending = len(payload) > 0 and not (k[0] and (rw == 'W' or k[1]))
+                    page = dev.page_addr
+                    tr = dev.parse(addr, rw, payload, fack, lack)
+                    rows.append((addr, rw, fack, lack, payload, tr.reg, tr.value, tr.status, page, pending))
+
+                    if rw == 'W' and len(payload) > 0:
+                        k[1] = True
+                        if (not k[0] and len(payload) > 1 and payload[0] in dev.definition.page_regs
+                                and str(payload[1]) in dev.pages):
+                            k[0] = True
+
+        state = {addr: (self.devices[addr].page_addr, self.devices[addr].last_reg, k[0], k[1]) for addr, k in known.items()}
+        return rows, state
+
+    def parse_parallel(self, path: str, workers: Optional[int] = None, chunk_bytes: int = 8 * 1024 * 1024):
+        ''' Decode a capture file across a process pool. Yields the same transactions, in the same
+            order, as parse_file(). Chunks are split at line boundaries. Frames that depend on device
+            state from before their chunk are decoded again here in order, then the device state is
+            carried over to the next chunk. Only text captures can be split, others raise ValueError '''
+        path = os.fspath(path)
+        require_text_capture(path, "parse_parallel()")
+        workers = workers or os.cpu_count() or 1
+        chunks = split_chunks(path, chunk_bytes)
+        config = (self.settings_file, self.devices_dir, self.cache_dir, frozenset(self.ignore_addrs))
+
+        with ProcessPoolExecutor(workers, initializer=init_chunk_worker, initargs=config) as pool:
+            futures = deque()
+            chunks = iter(chunks)
+            for start, end in chunks:
+                futures.append(pool.submit(decode_chunk_worker, path, start, end))
+                if len(futures) >= workers * 2:
+                    break
+
+            while futures:
+                rows, state = futures.popleft().result()
+                # Keep the pool busy while this chunk is merged
+                for start, end in chunks:
+                    futures.append(pool.submit(decode_chunk_worker, path, start, end))
+                    break
+                yield from self.merge_chunk(rows, state)
+
+    def merge_chunk(self, rows, state):
+        delta = self.delta
+        for addr, rw, fack, lack, payload, reg, value, status, page, pending in rows:
+            if pending:
+                tr = self.parse_frame(addr, rw, fack, lack, payload)
+            elif status == TR_IGNORED:
+                tr = transaction(addr, rw, fack, lack, payload, status=status)
+            else:
+                dev = self.device(addr)
+                dec = dev.pages[page][reg] if status == TR_OK else None
+                tr = transaction(addr, rw, fack, lack, payload, reg, value, status, dev, dec)
+                if self.telemetry is not None:
+                    self.telemetry.add(tr)
+            # Change-only mode runs here, in capture order, so it matches parse_file()
+            if delta is None or delta.keep(tr):
+                yield tr
+
+        # Only the parts the chunk set itself. Anything else was already updated by the pending frames
+        for addr, (page, last_reg, page_known, reg_known) in state.items():
+            dev = self.device(addr)
+            if page_known:
+                dev.set_page(page)
+            if reg_known:
+                dev.last_reg = last_reg
+
+    def decode_batch(self, inputs, out_dir: str, workers: Optional[int] = None, ext: str = ".jsonl",
+                     resume: bool = True, progress = None) -> Dict[str, Any]:
+        ''' Decode many captures across a process pool. inputs is a directory, a glob pattern or a list of
+            paths. Every capture gets its own output (ext picks the sink) and a .summary.json with counts,
+            NACKs per device and value ranges per register, and batch_summary.json merges them all.
+
+            The device definitions are loaded once here and handed to the workers, so no worker reads
+            settings.json more than once or any device JSON at all. With resume, captures whose summary
+            matches the capture's size and mtime are skipped, so an interrupted run picks up where it stopped.
+            A capture that fails gets a summary with an 'error' and no output, and the rest still run.
+            progress(done, total, summary) is called as each capture finishes '''
+        paths = batch_inputs(inputs)
+        os.makedirs(out_dir, exist_ok=True)
+        if progress is None:
+            progress = lambda done, total, summary: print(f"[{done}/{total}] {summary['source']} "
+                                                          + (f"FAILED: {summary['error']}" if 'error' in summary else f"{summary['frames']} frames")
+                                                          + (" (done before)" if summary.get('resumed') else ""))
+
+        jobs = []
+        summaries = []
+        for path in paths:
+            out_path, summary_path = batch_outputs(path, out_dir, ext)
+            summary = read_summary(summary_path, path) if resume else None
+            if summary is not None and 'error' not in summary and os.path.exists(summary['output']):
+                summary['resumed'] = True
+                summaries.append(summary)
+                progress(len(summaries), len(paths), summary)
+            else:
+                jobs.append((path, out_path, summary_path))
+
+        if jobs:
+            self.preload_devices()
+            defs = [(d.path, d.regs, d.stamp) for d in DEVICE_DEFS.values()]
+            config = (self.settings_file, self.devices_dir, self.cache_dir, frozenset(self.ignore_addrs), self.filter, defs)
+            workers = min(workers or os.cpu_count() or 1, len(jobs))
+            with ProcessPoolExecutor(workers, initializer=init_batch_worker, initargs=config) as pool:
+                futures = {pool.submit(decode_file_worker, *job) : job for job in jobs}
+                for future in as_completed(futures):
+                    try:
+                        summary = future.result()
+                    except Exception as e: # Also a worker that died (BrokenProcessPool)
+                        summary = failed_summary(*futures[future], e)
+                    summaries.append(summary)
+                    progress(len(summaries), len(paths), summary)
+
+        order = {path: n for n, path in enumerate(paths)}
+        summaries.sort(key=lambda summary: order[summary['source']])
+        merged = merge_summaries(summaries)
+        write_json(os.path.join(out_dir, "batch_summary.json"), merged)
+        return merged
+
+    def device_state(self) -> Dict[int, Tuple[str, int]]:
+        ''' Current (page, last register) of every device '''
+        return {addr: (dev.page_addr, dev.last_reg) for addr, dev in self.devices.items()}
+
+    def set_device_state(self, state: Dict[int, Tuple[str, int]]):
+        for addr, (page, last_reg) in state.items():
+            dev = self.device(addr)
+            if page is not None: # Not loaded yet when the state was taken, so still on the default page
+                dev.set_page(page)
+            dev.last_reg = last_reg
+
+    def reset_devices(self):
+        for dev in self.devices.values():
+            dev.reset()
+
+    def advance_state(self, line):
+        ''' Update the device page/register state for a line without decoding any values '''
+        for addr, rw, fack, lack, payload in tokenize(line):
+            if addr in self.ignore_addrs or len(payload) == 0:
+                continue
+            dev = self.device(addr)
+            reg, dec, data = dev.resolve(rw, payload)
+            if dec is not None and dec.format == "PAGE" and len(data) > 0:
+                dev.change_page(dec, data)
+
+    def build_index(self, path: str, index_path: Optional[str] = None,
+                    checkpoint_lines: int = INDEX_CHECKPOINT_LINES) -> capture_index:
+        ''' Build or update the sidecar index for a capture. An existing index for the same file is
+            extended from where it stopped, so a growing capture only indexes the new lines.
+            Device state is reset first and left at the end of the capture. Text captures only '''
+        path = os.fspath(path)
+        require_text_capture(path, "build_index()")
+        idx = capture_index(path, index_path)
+        if not idx.load() or not idx.matches_capture():
+            idx = capture_index(path, index_path, checkpoint_lines)
+
+        self.reset_devices()
+        if idx.lines == 0:
+            idx.checkpoints.append((0, 0, self.device_state()))
+        else:
+            self.set_device_state(idx.state)
+
+        size = os.path.getsize(path)
+        if size > idx.size:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                mm.seek(idx.size)
+                offset = idx.size
+                line_no = idx.lines
+                while offset < size:
+                    line = mm.readline()
+                    if not line.endswith(b"\n"):
+                        break # Partial line still being written. Pick it up next time
+
+                    seen = set()
+                    for addr, rw, fack, lack, payload in tokenize(line):
+                        if addr in self.ignore_addrs:
+                            continue
+                        dev = self.device(addr)
+                        page = dev.page_addr
+                        if len(payload) == 0: # Address only frames are indexed without a register
+                            reg, dec, data = None, None, payload
+                        else:
+                            reg, dec, data = dev.resolve(rw, payload)
+                        key = (addr, page, reg)
+                        if key not in seen:
+                            seen.add(key)
+                            idx.add(key, line_no, offset)
+                        if dec is not None and dec.format == "PAGE" and len(data) > 0:
+                            dev.change_page(dec, data)
+
+                    offset += len(line)
+                    line_no += 1
+                    if line_no % idx.checkpoint_lines == 0:
+                        idx.checkpoints.append((line_no, offset, self.device_state()))
+
+                idx.size = offset
+                idx.lines = line_no
+
+        idx.state = self.device_state()
+        idx.save()
+        return idx
+
+    def query_index(self, path: str, addr: int, page: Optional[str] = None, reg: Optional[int] = None,
+                    start_line: int = 0, end_line: Optional[int] = None, index_path: Optional[str] = None):
+        ''' Yield (line number, transaction) for every frame to addr (and page/reg if given) in
+            [start_line, end_line). Uses the sidecar index to only decode the matching lines, starting
+            from the nearest state checkpoint. The index is built or updated first if needed. Text captures only '''
+        path = os.fspath(path)
+        require_text_capture(path, "query_index()")
+        idx = capture_index(path, index_path)
+        if not idx.load() or not idx.up_to_date():
+            idx = self.build_index(path, index_path)
+
+        targets = idx.lookup(addr, page, reg, start_line, end_line)
+        if not targets:
+            return
+
+        cp_lines = [cp[0] for cp in idx.checkpoints]
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            cur = None
+            for line_no, offset in targets:
+                # Jump to the checkpoint before the line unless we are already close to it
+                if cur is None or line_no - cur > idx.checkpoint_lines:
+                    cp_line, cp_offset, state = idx.checkpoints[bisect.bisect_right(cp_lines, line_no) - 1]
+                    self.reset_devices()
+                    self.set_device_state(state)
+                    mm.seek(cp_offset)
+                    cur = cp_line
+                while cur < line_no:
+                    self.advance_state(mm.readline())
+                    cur += 1
+
+                line = mm.readline()
+                cur += 1
+                for frame in tokenize(line):
+                    frame_page = None if frame[0] in self.ignore_addrs else self.device(frame[0]).page_addr
+                    tr = self.parse_frame(*frame)
+                    if tr.addr == addr and (reg is None or tr.reg == reg) and (page is None or frame_page == page):
+                        yield line_no, tr
+
+    def preload_devices(self):
+        ''' Load every device definition now instead of on the first transaction '''
+        for dev in self.devices.values():
+            if not dev.loaded:
+                dev.load()
+
+    def close(self):
+        ''' Flush and close the capture recorder '''
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def read_lines(self, source):
+        ''' Yield lines from a path (memory mapped, as bytes), an open file or any iterable of lines '''
+        if not isinstance(source, (str, os.PathLike)):
+            yield from source
+            return
+
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter(mm.readline, b"")
+
+    def parse_stream(self, source):
+        ''' Lazily decode a capture. source can be a path, an open file or any iterable of
+            str/bytes lines. Yields one transaction per frame '''
+        for line in self.read_lines(source):
+            result_list = self.parse(line)
+            if result_list is not None:
+                yield from result_list
+
+    def parse_file(self, path):
+        ''' Decode a capture file. The file is memory mapped and read line by line as bytes
+            so memory use stays flat no matter how large the capture is. Binary record and
+            CSV captures are decoded straight from their frames '''
+        path = os.fspath(path)
+        if capture_format(path) == "text":
+            return self.parse_stream(path)
+        return self.parse_frames(self.read_frames(path))
+
+    def read_frames(self, path: str):
+        ''' (addr, rw, fack, lack, payload) frames from any capture format '''
+        fmt = capture_format(path)
+        if fmt == "records":
+            return read_records(path)
+        if fmt == "csv":
+            return read_csv_frames(path)
+        return (frame for line in self.read_lines(path) for frame in tokenize(line))
+
+    def parse_frames(self, frames):
+        ''' Decode already split frames, e.g. from read_records(). Yields one transaction per frame '''
+        parse_frame = self.parse_frame if self.filter is None else self.filter_frame
+        for frame in frames:
+            if self.stats is None:
+                tr = parse_frame(*frame)
+            else:
+                start = time.perf_counter_ns()
+                tr = parse_frame(*frame)
+                if tr is None:
+                    continue
+                ns = time.perf_counter_ns() - start
+                self.stats.add(tr, ns)
+                if self.trace_hook is not None:
+                    self.trace_hook("decode", tr, ns)
+            if tr is not None and (self.delta is None or self.delta.keep(tr)):
+                yield tr
+
+    def archive(self, path: str, out_path: str) -> int:
+        ''' Convert a text or CSV capture to a binary record file. Returns the frame count '''
+        return write_records(out_path, self.read_frames(path))
+
+    def collect_batch(self, source, with_time: bool = False) -> batch_collector:
+        ''' Batch mode. Track paging and registers like parse() but only collect the raw
+            L11/L16/LINEAR words and REG/BIT/BIN registers with bit fields, sequenced by
+            line number. Call convert() on the result to get numpy arrays. Other formats are skipped '''
+        batch = batch_collector(with_time)
+        for seq, line in enumerate(self.read_lines(source)):
+            ts = time.perf_counter() if with_time else 0.0
+            for addr, rw, fack, lack, payload in tokenize(line):
+                if addr in self.ignore_addrs or len(payload) == 0:
+                    continue
+
+                dev = self.devices.get(addr)
+                if dev is None:
+                    continue # Unknown devices have no formatted registers
+
+                reg, dec, data = dev.resolve(rw, payload)
+                if dec is None or len(data) == 0:
+                    continue
+                if dec.format in BATCH_FORMATS or dec.fields:
+                    batch.add(addr, dev.page_addr, reg, dec, data, seq, ts)
+                elif dec.format == "PAGE":
+                    dev.change_page(dec, data)
+        return batch
+
+    def find_flags(self, source, names) -> Dict[Tuple[int, str, int], Any]:
+        ''' Line numbers of every read/write with any of the named bit fields set, per
+            (addr, page, reg). One mask and compare per register over the whole capture '''
+        if np is None:
+            raise ImportError("numpy is required for batch conversion")
+        names = set(names)
+        found = {}
+        for key, (dec, words, seq, ts) in self.collect_batch(source).regs.items():
+            mask = 0
+            for name, field_mask, shift in dec.fields:
+                if name in names:
+                    mask |= field_mask
+            if mask == 0:
+                continue
+            hits = np.nonzero(batch_convert(dec, words) & np.uint64(mask))[0]
+            found[key] = np.frombuffer(seq, dtype=np.uint64)[hits]
+        return found
+
     #print debug messages based on debug level
     def printc(self, message: str, dbg: int, color: str = None):
         if dbg <= self.debug:
             color = self.color if color is None else color
             print(f"{color}{message}{ENDC}")
 
-    def printc_result(self, result: List, color: str = None):
+    def decode_to(self, source, sink: output_sink) -> int:
+        ''' Decode a capture (path or iterable of lines) into sink. Returns the transaction count.
+            Sink rendering time is added to stats.render_ns when stats are on '''
+        count = sink.count
+        if isinstance(source, (str, os.PathLike)) and capture_format(source) != "text":
+            blocks = ((None, [tr]) for tr in self.parse_frames(self.read_frames(source)))
+        else:
+            blocks = ((line, self.parse(line)) for line in self.read_lines(source))
+
+        delta = self.delta
+        # Lines without frames still reach the sink unless a filter or delta mode is thinning the output
+        every_line = self.filter is None and delta is None
+        for line, result_list in blocks:
+            if delta is not None and delta.due():
+                sink.write_repeats(delta.take_repeats())
+            if result_list is None:
+                if not every_line:
+                    continue
+                result_list = ()
+            if self.stats is None:
+                sink.write_line(line, result_list)
+                continue
+            start = time.perf_counter_ns()
+            sink.write_line(line, result_list)
+            self.stats.render_ns += time.perf_counter_ns() - start
+        if delta is not None:
+            sink.write_repeats(delta.take_repeats())
+        sink.flush()
+        return sink.count - count
+
+    def printc_result(self, result: transaction, color: str = None):
+        if self.stats is not None:
+            start = time.perf_counter_ns()
+            self.printc(f"{result['name']}({result['addr']}) {result['rw']} ({result['fack']}) {result['reg_name']}({result['reg']}) {result['result']} ({result['raw']})", DBG_NONE, result['color'])
+            ns = time.perf_counter_ns() - start
+            self.stats.render_ns += ns
+            if self.trace_hook is not None:
+                self.trace_hook("render", result, ns)
+            return
 
         self.printc(f"{result['name']}({result['addr']}) {result['rw']} ({result['fack']}) {result['reg_name']}({result['reg']}) {result['result']} ({result['raw']})", DBG_NONE, result['color'])
 
 
 
+def split_chunks(path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    ''' Byte ranges of about chunk_bytes that start and end on line boundaries '''
+    size = os.path.getsize(path)
+    chunks = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size) if start + chunk_bytes < size else size
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+worker_parm = None # Parmesean used by each parse_parallel() worker process
+
+def init_chunk_worker(settings_file: str, devices_dir: str, cache_dir: Optional[str], ignore_addrs):
+    global worker_parm
+    worker_parm = Parmesean(settings_file=settings_file, devices_dir=devices_dir, cache_dir=cache_dir)
+    worker_parm.ignore_addrs = set(ignore_addrs)
+
+def decode_chunk_worker(path: str, start: int, end: int):
+    return worker_parm.decode_chunk(path, start, end)
+
+
+BATCH_EXTS = (".txt", ".csv", ".prmb") # Capture files picked up from a directory
+
+def batch_inputs(inputs) -> List[str]:
+    ''' Capture paths from a directory, a glob pattern or a list of paths '''
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = os.fspath(inputs)
+        if os.path.isdir(inputs):
+            paths = [os.path.join(inputs, name) for name in sorted(os.listdir(inputs))
+                     if name.lower().endswith(BATCH_EXTS) and os.path.isfile(os.path.join(inputs, name))]
+        else:
+            paths = sorted(glob.glob(inputs))
+    else:
+        paths = [os.fspath(p) for p in inputs]
+    paths = [os.path.abspath(p) for p in paths]
+
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Batch captures need unique file names, outputs are named after them")
+    return paths
+
+
+def batch_outputs(path: str, out_dir: str, ext: str) -> Tuple[str, str]:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir, name + ext), os.path.join(out_dir, name + ".summary.json")
+
+
+def read_summary(summary_path: str, path: str) -> Optional[Dict[str, Any]]:
+    ''' Summary of a finished capture, or None if it is missing or the capture changed since '''
+    try:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    st = os.stat(path)
+    if summary.get('source') != path or summary.get('stamp') != [st.st_mtime_ns, st.st_size]:
+        return None
+    return summary
+
+
+def write_json(path: str, data):
+    # Write then rename so an interrupted run never leaves a half written file behind
+    tmp = path + ".part"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp, path)
+
+
+def init_batch_worker(settings_file: str, devices_dir: str, cache_dir: Optional[str], ignore_addrs, flt, defs):
+    # Definitions compiled by the parent. load_device_def() finds them by path and stamp
+    for path, regs, stamp in defs:
+        DEVICE_DEFS[path] = device_def(path, regs, stamp)
+    init_chunk_worker(settings_file, devices_dir, cache_dir, ignore_addrs)
+    worker_parm.set_filter(flt)
+
+
+def decode_file_worker(path: str, out_path: str, summary_path: str) -> Dict[str, Any]:
+    parm = worker_parm
+    parm.reset_devices()
+    stats = parm.enable_stats()
+    telemetry = parm.enable_telemetry(bucket_seconds=1e12, keep_buckets=1) # Totals only
+    st = os.stat(path)
+    start = time.perf_counter()
+
+    tmp = out_path + ".part"
+    try:
+        # Device debug output would only interleave between the workers
+        with contextlib.redirect_stdout(io.StringIO()), SINK_TYPES[os.path.splitext(out_path)[1].lower()](tmp) as sink:
+            parm.decode_to(path, sink)
+        os.replace(tmp, out_path)
+    except BaseException:
+        parm.disable_stats()
+        parm.disable_telemetry()
+        remove_file(tmp)
+        raise
+
+    snap = stats.snapshot(parm.devices)
+    summary = {
+        'source' : path,
+        'stamp' : [st.st_mtime_ns, st.st_size],
+        'output' : out_path,
+        'seconds' : time.perf_counter() - start,
+        'lines' : snap['lines'],
+        'frames' : snap['frames'],
+        'nacks' : snap['nacks'],
+        'unknown_regs' : snap['unknown_regs'],
+        'ignored' : snap['ignored'],
+        'devices' : snap['devices'],
+        'registers' : {f"0x{addr:02X}:{page}:0x{reg:02X}": summary_stats(entry[0], entry[1])
+                       for (addr, page, reg), entry in telemetry.regs.items()},
+    }
+    parm.disable_stats()
+    parm.disable_telemetry()
+    write_json(summary_path, summary)
+    return summary
+
+
+def failed_summary(path: str, out_path: str, summary_path: str, error: BaseException) -> Dict[str, Any]:
+    ''' Summary for a capture that raised. Written like a normal summary but never resumed from '''
+    remove_file(out_path + ".part")
+    summary = {'source' : path, 'output' : None, 'error' : f"{type(error).__name__}: {error}", 'seconds' : 0.0,
+               'lines' : 0, 'frames' : 0, 'nacks' : 0, 'unknown_regs' : 0, 'ignored' : 0, 'devices' : {}, 'registers' : {}}
+    write_json(summary_path, summary)
+    return summary
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def summary_stats(dec: reg_decoder, stats: running_stats) -> Dict[str, Any]:
+    out = stats.as_dict()
+    out.update({'name' : dec.name, 'units' : dec.units, 'm2' : stats.m2})
+    return out
+
+
+def merge_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ''' One summary for a batch. Counts are summed and register ranges combined '''
+    merged = {'files' : len(summaries), 'seconds' : 0.0, 'lines' : 0, 'frames' : 0, 'nacks' : 0,
+              'unknown_regs' : 0, 'ignored' : 0, 'devices' : {}, 'registers' : {}, 'captures' : [], 'failed' : []}
+    regs = {}
+    for summary in summaries:
+        for key in ('seconds', 'lines', 'frames', 'nacks', 'unknown_regs', 'ignored'):
+            merged[key] += summary[key]
+        merged['captures'].append({'source' : summary['source'], 'output' : summary['output'], 'frames' : summary['frames']})
+        if 'error' in summary:
+            merged['captures'][-1]['error'] = summary['error']
+            merged['failed'].append(summary['source'])
+
+        for addr, counts in summary['devices'].items():
+            dev = merged['devices'].setdefault(addr, {'name' : counts['name'], 'frames' : 0, 'nacks' : 0, 'unknown_regs' : 0})
+            for key in ('frames', 'nacks', 'unknown_regs'):
+                dev[key] += counts[key]
+
+        for key, r in summary['registers'].items():
+            part = running_stats()
+            part.count, part.mean, part.m2, part.min, part.max, part.last = r['count'], r['mean'], r['m2'], r['min'], r['max'], r['last']
+            entry = regs.get(key)
+            if entry is None:
+                regs[key] = (r['name'], r['units'], part)
+            else:
+                entry[2].merge(part)
+
+    for key, (name, units, stats) in regs.items():
+        merged['registers'][key] = dict(stats.as_dict(), name=name, units=units)
+    return merged
+
+
 if __name__ == "__main__":
-    parm = Parmesean()
-    IN_FILE = os.path.join(CURRENT_DIR,"output\\20251113_170222.txt")
-
-    with open(IN_FILE, 'r') as f:
-        print(f"Parsing all data in: {IN_FILE}")
-        for line in f:
-
-            ''' Process every frame from the input analyzer and reutrn a full I2C transaction frame'''
-            print("----------------------------------------------------")
-            result_list = parm.parse(line)
-            line = line.strip()
-            line= line.replace(" ", "")
-            print(line)
-            if result_list is not None:
-                for r in result_list:
-                    parm.printc_result(r, DBG_NONE)
-                # self.printc(f"Decoding: {line}", DBG_MAX, color)
-                #Stop frame -- return the final frame to the HLA
-                # data_pattern = re.compile(r"0x([0-9a-fA-F]{2}) $")
-            
-
-            
-    
-    print(f"Conversion Complete")
-    
+    import argparse
+    parser = argparse.ArgumentParser(description="Decode I2C analyzer captures")
+    parser.add_argument("capture", nargs="?", default=IN_FILE, help="Capture file. With --batch a directory or glob")
+    parser.add_argument("output", nargs="?", help="Output .jsonl/.csv/.prmd file. Default is the terminal")
+    parser.add_argument("--batch", metavar="OUT_DIR", help="Decode every capture in the directory/glob into OUT_DIR")
+    parser.add_argument("--format", default=".jsonl", help="Batch output type (.jsonl, .csv, .prmd)")
+    parser.add_argument("--workers", type=int, help="Batch worker processes")
+    parser.add_argument("--restart", action="store_true", help="Batch: decode captures that already finished again")
+    parser.add_argument("--filter", help='Only decode matching frames, e.g. "addr=0x44 rw=R"')
+    args = parser.parse_args()
+    try:
+        flt = compile_filter(args.filter) if args.filter else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.batch is None and args.output is None:
+        print("\033c")
+        print("\x1b[H\x1b[2J\033[0m")
+        print("----------Welcome to Parmesean----------")
+    parm = Parmesean(verbose=args.batch is None and args.output is None)
+    if flt is not None:
+        parm.set_filter(flt)
+
+    if args.batch is not None:
+        summary = parm.decode_batch(args.capture, args.batch, args.workers, args.format, resume=not args.restart)
+        print(f"Batch Complete: {summary['files']} captures, {summary['frames']} frames, {summary['nacks']} NACKs"
+              + (f", {len(summary['failed'])} failed" if summary['failed'] else ""))
+        sys.exit(1 if summary['failed'] else 0)
+
+    print(f"Parsing all data in: {args.capture}")
+    with open_sink(args.output) as sink:
+        count = parm.decode_to(args.capture, sink)
+
+    print(f"Conversion Complete: {count} transactions")
@@ -0,0 +1,53 @@
+import os
+import sys
+import random
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import parmesean  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, "test_input.txt")
+
+# PAGE writes and reads whose register comes from an earlier write, so decoding depends on device state
+STATE_LINES = [
+    "[0x44W + 0x00 + 0x00 + ]\n",
+    "[0x44W + 0x00 + 0x01 + ]\n",
+    "[0x45W + 0x00 + 0x01 + ]\n",
+    "[0x45W + 0x00 + 0x00 + ]\n",
+    "[0x44W + 0x8B +[0x44R + 0x12 + 0x34 - ]\n",
+    "[0x45W + 0x8B + ]\n",
+    "[0x45R + 0x00 + 0x20 - ]\n",
+    "[0x48R + 0x0C + 0x80 - ]\n",
+    "[0x10W + 0x01 + 0x02 + ]\n",
+]
+
+
+def capture_lines(count: int, seed: int = 1):
+    ''' Sample capture lines shuffled with extra PAGE changes and register-less reads '''
+    with open(SAMPLE, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    rng = random.Random(seed)
+    return [rng.choice(lines + STATE_LINES * 10) for _ in range(count)]
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = tmp_path / "capture.txt"
+    path.write_text("".join(capture_lines(3000)), encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def parm():
+    return parmesean.Parmesean(cache_dir=None)
+
+
+def decode_all(parm, path):
+    return [tr.as_dict() for tr in parm.parse_file(path)]
+
+
+def device_state(parm):
+    return {addr: (dev.page_addr, dev.last_reg) for addr, dev in parm.devices.items()}
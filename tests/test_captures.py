@@ -0,0 +1,82 @@
+import csv
+import io
+
+import pytest
+
+from conftest import decode_all
+import parmesean
+
+
+def text_frames(path):
+    with open(path, 'rb') as f:
+        return [(addr, rw, fack, lack, bytes(payload)) for line in f for addr, rw, fack, lack, payload in parmesean.tokenize(line)]
+
+
+def ack_text(ack):
+    return "" if ack is None else ("ACK" if ack else "NAK")
+
+
+def write_csv(path, frames, rw_words=("R", "W")):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["addr", "rw", "fack", "lack", "data"])
+        for addr, rw, fack, lack, payload in frames:
+            writer.writerow([f"0x{addr:02X}", rw_words[rw == 'W'], ack_text(fack), ack_text(lack), payload.hex(" ")])
+
+
+def test_record_round_trip(capture, tmp_path):
+    frames = text_frames(capture)
+    path = tmp_path / "capture.prmb"
+    assert parmesean.write_records(path, frames) == len(frames)
+    assert [(a, rw, fack, lack, bytes(p)) for a, rw, fack, lack, p in parmesean.read_records(path)] == frames
+
+
+def test_csv_round_trip(capture, tmp_path):
+    frames = text_frames(capture)
+    path = tmp_path / "capture.csv"
+    write_csv(path, frames, rw_words=("Read", "Write"))
+    assert list(parmesean.read_csv_frames(path)) == frames
+
+
+@pytest.mark.parametrize("ext", [".prmb", ".csv"])
+def test_frame_captures_decode_like_text(capture, parm, tmp_path, ext):
+    path = tmp_path / ("capture" + ext)
+    if ext == ".csv":
+        write_csv(path, text_frames(capture))
+    else:
+        parmesean.write_records(path, text_frames(capture))
+    expected = decode_all(parm, capture)
+    assert decode_all(parmesean.Parmesean(cache_dir=None), path) == expected
+
+
+def test_csv_byte_columns_and_extra_cells():
+    text = "ADDR,RW,d0,d1\n0x44,WRITE,00,01\n0x44,rd,12,34,extra\n"
+    frames = list(parmesean.read_csv_frames(io.StringIO(text)))
+    assert frames == [(0x44, 'W', True, None, b"\x00\x01"), (0x44, 'R', True, None, b"\x12\x34")]
+
+
+@pytest.mark.parametrize("row", ["0x44,X,+,,00", "zz,W,+,,00", "0x44,W,+,,0G"])
+def test_csv_bad_row_names_the_line(row):
+    text = "addr,rw,fack,lack,data\n0x44,W,+,,00\n" + row + "\n"
+    with pytest.raises(ValueError, match="line 3"):
+        list(parmesean.read_csv_frames(io.StringIO(text)))
+
+
+def test_csv_needs_addr_and_rw():
+    with pytest.raises(ValueError):
+        list(parmesean.read_csv_frames(io.StringIO("addr,data\n0x44,00\n")))
+
+
+def test_decoded_records_round_trip(capture, parm, tmp_path):
+    path = tmp_path / "decoded.prmd"
+    with parmesean.binary_sink(str(path)) as sink:
+        parm.decode_to(capture, sink)
+    rows = list(parmesean.read_decoded(str(path)))
+    trs = list(parmesean.Parmesean(cache_dir=None).parse_file(capture))
+    assert len(rows) == len(trs)
+    for (addr, rw, fack, lack, reg, status, value, payload), tr in zip(rows, trs):
+        assert (addr, rw, fack, lack, status, payload) == (tr.addr, tr.rw, tr.fack, tr.lack, tr.status, bytes(tr.payload))
+        if reg is not None:
+            assert reg == tr.reg
+        if isinstance(tr.value, (int, float)) and not isinstance(tr.value, bool):
+            assert value == pytest.approx(tr.value)
@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+import parmesean
+
+WORDS = range(0x10000)
+
+
+def scalar(dec, data):
+    ''' The plain converter the lookup table replaces '''
+    if dec.format == "LINEAR":
+        return dec.conv_linear(data)
+    return getattr(dec, f"conv_{dec.format.lower()}")(data)
+
+
+@pytest.mark.parametrize("info", [
+    {"format": "L11"},
+    {"format": "L16"},
+    {"format": "linear", "slope": 0.0078125, "offset": 0.0, "signed": True},
+    {"format": "linear", "slope": 2, "offset": -5, "signed": False},
+    {"format": "linear", "slope": 1, "offset": 0.5, "signed": "True", "endian": "little"},
+])
+def test_table_matches_scalar_for_every_word(info):
+    dec = parmesean.reg_decoder("0x20", dict(info, name="TEST"))
+    ref = parmesean.reg_decoder("0x20", dict(info, name="TEST"))
+    for word in WORDS:
+        data = struct.pack(">H", word)
+        got = dec.convert(data)
+        want = scalar(ref, data)
+        assert got == want and type(got) is type(want), (hex(word), got, want)
+    assert dec.table is not None
+
+
+def test_linear_other_lengths_skip_the_table():
+    dec = parmesean.reg_decoder("0x20", {"name": "TEST", "format": "linear", "slope": 2, "offset": 1})
+    dec.convert(b"\x00\x01")
+    assert dec.convert(b"\x01") == 3
+    assert dec.convert(b"\x00\x00\x02") == 5
+
+
+def test_known_values():
+    l11 = parmesean.reg_decoder("0x20", {"name": "TEST", "format": "L11"})
+    l16 = parmesean.reg_decoder("0x20", {"name": "TEST", "format": "L16"})
+    assert l11.convert(b"\xDA\x80") == parmesean.l11_to_float(0x80DA) # Low byte first
+    assert l11.convert(b"\x01\xF8") == 0.5 # 1 * 2^-1
+    assert l16.convert(b"\x00\x10") == 1.0 # 0x1000 * 2^-12
+
+
+def test_tables_are_shared():
+    a = parmesean.reg_decoder("0x20", {"name": "A", "format": "L11"})
+    b = parmesean.reg_decoder("0x21", {"name": "B", "format": "L11"})
+    a.convert(b"\x00\x00")
+    b.convert(b"\x00\x00")
+    assert a.table is b.table
@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import decode_all
+import parmesean
+
+
+def test_compile_filter_terms():
+    flt = parmesean.compile_filter("addr=0x44,0x45 reg!=0x00 rw=R ack=+ lack=-")
+    assert flt.addrs == {0x44, 0x45}
+    assert flt.deny_regs == ({0x00}, set())
+    assert flt.rw == "R"
+    assert flt.fack is True and flt.lack is False
+    assert flt.accept_addr(0x44, True) and not flt.accept_addr(0x44, False)
+    assert not flt.accept_addr(0x48, True)
+
+
+@pytest.mark.parametrize("expr, rw", [("rw!=R", "W"), ("rw!=W", "R"), ("rw=r", "R"), ("rw=R,W", None)])
+def test_compile_filter_rw(expr, rw):
+    assert parmesean.compile_filter(expr).rw == rw
+
+
+def test_compile_filter_register_names():
+    flt = parmesean.compile_filter("reg=READ_VOUT,0x8C reg!=PAGE")
+    assert flt.regs == ({0x8C}, {"READ_VOUT"})
+    assert flt.deny_regs == (set(), {"PAGE"})
+
+
+@pytest.mark.parametrize("expr", ["addr=", "rw=X", "rw!=R,W", "ack=maybe", "lack=", "speed=100", "addr"])
+def test_compile_filter_bad_terms(expr):
+    with pytest.raises(ValueError):
+        parmesean.compile_filter(expr)
+
+
+def test_known_uses_configured_addresses(parm):
+    parm.device(0x10) # Unknown address seen before the filter is set
+    flt = parm.set_filter("known")
+    assert not flt.accept_addr(0x10, True)
+    assert flt.accept_addr(0x44, True)
+
+
+def selected(trs, addr=None, reg=None, rw=None):
+    return [tr for tr in trs if (addr is None or tr['addr'] == addr) and (reg is None or tr['reg'] == reg)
+            and (rw is None or tr['rw'] == rw)]
+
+
+@pytest.mark.parametrize("expr, keep", [
+    ("addr=0x44", dict(addr="0x44")),
+    ("addr=0x45 reg=0x8B", dict(addr="0x45", reg="0x8B")),
+    ("addr=0x44 rw=R", dict(addr="0x44", rw="R")),
+])
+def test_filtered_decode_matches_unfiltered(capture, parm, expr, keep):
+    # Rejected frames still change pages and registers, so kept frames decode the same
+    expected = selected(decode_all(parm, capture), **keep)
+    filtered = parmesean.Parmesean(cache_dir=None)
+    filtered.set_filter(expr)
+    got = decode_all(filtered, capture)
+    assert got == expected
+    assert got
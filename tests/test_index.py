@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import SAMPLE
+import parmesean
+
+
+def sequential(path, addr, page=None, reg=None, start=0, end=None):
+    ''' What query_index() should return, from a plain decode of the whole capture '''
+    parm = parmesean.Parmesean(cache_dir=None)
+    out = []
+    with open(path, 'rb') as f:
+        for n, line in enumerate(f):
+            for frame in parmesean.tokenize(line):
+                frame_page = parm.device(frame[0]).page_addr
+                tr = parm.parse_frame(*frame)
+                if (start <= n and (end is None or n < end) and tr.addr == addr
+                        and (reg is None or tr.reg == reg) and (page is None or frame_page == page)):
+                    out.append((n, tr.as_dict()))
+    return out
+
+
+def query(parm, path, *args):
+    return [(n, tr.as_dict()) for n, tr in parm.query_index(path, *args)]
+
+
+QUERIES = [
+    (0x45, "1", None),
+    (0x44, None, 0x8B, 1000, 2500),
+    (0x48, None, None, 500, 520),
+    (0x44, "0", 0x8B),
+    (0x10, None, None),
+]
+
+
+@pytest.mark.parametrize("q", QUERIES)
+def test_query_index_matches_sequential(capture, parm, q):
+    parm.build_index(capture, checkpoint_lines=100)
+    assert query(parm, capture, *q) == sequential(capture, *q)
+
+
+def test_query_index_after_capture_grows(capture, parm):
+    parm.build_index(capture, checkpoint_lines=100)
+    with open(SAMPLE, 'r', encoding='utf-8') as f:
+        sample = f.read()
+
+    # Append whole lines and a partial one. The partial line isn't indexed until it is finished
+    with open(capture, 'a', encoding='utf-8') as f:
+        f.write(sample + "[0x45W + 0x00 + 0x01 + ]\n[0x45W + 0x8B")
+    idx = parm.build_index(capture, checkpoint_lines=100)
+    assert idx.lines == 3000 + sample.count("\n") + 1
+    assert query(parm, capture, 0x45, "1", None) == sequential(capture, 0x45, "1", None)[:-1]
+
+    with open(capture, 'a', encoding='utf-8') as f:
+        f.write(" + 0x12 + 0x34 + ]\n")
+    got = query(parm, capture, 0x45, None, 0x8B)
+    assert got == sequential(capture, 0x45, None, 0x8B)
+    assert got[-1][0] == idx.lines
+
+
+def test_query_index_rebuilds_rewritten_capture(capture, parm, tmp_path):
+    parm.build_index(capture, checkpoint_lines=100)
+    capture.write_text("[0x44W + 0x00 + 0x01 + ]\n[0x44W + 0x8B +[0x44R + 0x12 + 0x34 - ]\n", encoding='utf-8')
+    assert query(parm, capture, 0x44, "1", 0x8B) == sequential(capture, 0x44, "1", 0x8B)
@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import capture_lines, decode_all, device_state
+import parmesean
+
+
+@pytest.mark.parametrize("chunk_bytes", [512, 4096, 1 << 20])
+def test_parse_parallel_matches_parse_file(capture, parm, chunk_bytes):
+    expected = decode_all(parm, capture)
+    par = parmesean.Parmesean(cache_dir=None)
+    got = [tr.as_dict() for tr in par.parse_parallel(capture, workers=2, chunk_bytes=chunk_bytes)]
+    assert got == expected
+    assert device_state(par) == device_state(parm)
+
+
+def test_parse_parallel_page_change_at_chunk_edge(tmp_path, parm):
+    # Every chunk starts right after a PAGE write and with a read that needs the previous register
+    chunk = "[0x44W + 0x00 + 0x01 + ]\n[0x44W + 0x8B + ]\n"
+    lines = []
+    for n in range(200):
+        lines.append(chunk if n % 2 else "[0x44W + 0x00 + 0x00 + ]\n[0x44W + 0x8C + ]\n")
+        lines.append("[0x44R + 0x12 + 0x34 - ]\n")
+    path = tmp_path / "edges.txt"
+    path.write_text("".join(lines), encoding='utf-8')
+
+    expected = decode_all(parm, path)
+    par = parmesean.Parmesean(cache_dir=None)
+    got = [tr.as_dict() for tr in par.parse_parallel(path, workers=2, chunk_bytes=len(chunk))]
+    assert got == expected
+    assert device_state(par) == device_state(parm)
+
+
+def test_parse_parallel_needs_text_capture(tmp_path, parm):
+    path = tmp_path / "capture.prmb"
+    parmesean.write_records(path, [(0x44, 'W', True, None, b"\x00\x01")])
+    with pytest.raises(ValueError):
+        list(parm.parse_parallel(path))
+
+
+def test_parse_parallel_partial_last_line(tmp_path, parm):
+    path = tmp_path / "partial.txt"
+    path.write_text("".join(capture_lines(500, seed=2)) + "[0x45W + 0x8B", encoding='utf-8')
+    expected = decode_all(parm, path)
+    par = parmesean.Parmesean(cache_dir=None)
+    assert [tr.as_dict() for tr in par.parse_parallel(path, workers=2, chunk_bytes=1024)] == expected